@@ -1,56 +1,34 @@
 from typing import List, Any, Optional
 from langchain_core.tools import Tool
-from langchain_openai import ChatOpenAI
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 import json
+import os
 import time
-from server.vector_store import VectorStore
+from server.vector_store import get_vector_store
 from server.tracing import get_tracer
 from server.llm_monitoring import LLMMonitor
-import re
-import os
+from server.llm_clients import get_chat_model
+from modules.mcp_client import call_mcp_tool, run_async
+from modules.lazy_ingest import LazyIngest
 import nest_asyncio
 
 nest_asyncio.apply()
 
-def run_async(coro):
-    import asyncio
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
-    if loop and loop.is_running():
-        import nest_asyncio
-        nest_asyncio.apply()
-        return loop.run_until_complete(coro)
-    else:
-        return asyncio.run(coro)
-
 class DocumentAgents:
     """
     Holds LLM and agent configuration. Each method returns a LangChain Tool for a document understanding step.
     """
     def __init__(self, llm=None):
-        self.llm = llm or ChatOpenAI(model="gpt-4-turbo-preview")
+        self.llm = llm or get_chat_model()
 
     def pdf_extractor_tool(self) -> Tool:
         """LangChain Tool for PDF extraction via MCP stdio tool."""
         def extract(pdf_path: str) -> str:
-            async def extract_async():
-                server_params = StdioServerParameters(
-                    command="python",
-                    args=["server/pdf_processing_server.py"],
-                )
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(
-                            "extract_pdf_contents",
-                            arguments={"pdf_path": pdf_path}
-                        )
-                        return result.content[0].text
-            return run_async(extract_async())
+            content = run_async(call_mcp_tool(
+                "server/pdf_processing_server.py",
+                "extract_pdf_contents",
+                {"pdf_path": pdf_path}
+            ))
+            return content[0].text
         return Tool(
             name="PDF Extractor",
             description="Extracts text from a PDF file using the MCP pdfextractor tool.",
@@ -60,20 +38,12 @@ class DocumentAgents:
     def chunker_tool(self) -> Tool:
         """LangChain Tool for chunking via MCP stdio tool."""
         def chunk(text: str, chunk_size: int = 500) -> List[str]:
-            async def chunk_async():
-                server_params = StdioServerParameters(
-                    command="python",
-                    args=["server/pdf_processing_server.py"],
-                )
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(
-                            "chunk_text",
-                            arguments={"text": text, "chunk_size": chunk_size}
-                        )
-                        return [c.text for c in result.content]
-            return run_async(chunk_async())
+            content = run_async(call_mcp_tool(
+                "server/pdf_processing_server.py",
+                "chunk_text",
+                {"text": text, "chunk_size": chunk_size}
+            ))
+            return [c.text for c in content]
         return Tool(
             name="Chunker",
             description="Splits text into chunks using the MCP chunker tool.",
@@ -84,22 +54,14 @@ class DocumentAgents:
         """LangChain Tool for embedding via MCP stdio tool."""
         def embed(input_data: Any) -> List[List[float]]:
             chunks = input_data["text_chunks"] if isinstance(input_data, dict) else input_data
-            async def embed_async():
-                server_params = StdioServerParameters(
-                    command="python",
-                    args=["server/pdf_processing_server.py"],
-                )
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(
-                            "embed_chunks",
-                            arguments={"text_chunks": chunks}
-                        )
-                        if result.content and result.content[0].text.startswith("Error"):
-                            raise ValueError(result.content[0].text)
-                        return [json.loads(c.text) for c in result.content]
-            return run_async(embed_async())
+            content = run_async(call_mcp_tool(
+                "server/pdf_processing_server.py",
+                "embed_chunks",
+                {"text_chunks": chunks}
+            ))
+            if content and content[0].text.startswith("Error"):
+                raise ValueError(content[0].text)
+            return [json.loads(c.text) for c in content]
         return Tool(
             name="Embedder",
             description="Embeds text chunks using the MCP embedder tool.",
@@ -109,123 +71,142 @@ class DocumentAgents:
     def summarizer_tool(self) -> Tool:
         """LangChain Tool for summarization via MCP stdio tool."""
         def summarize(text_or_chunks: Any) -> str:
-            async def summarize_async():
-                server_params = StdioServerParameters(
-                    command="python",
-                    args=["server/summarizer_qna_server.py"],
-                )
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(
-                            "summarize_text",
-                            arguments={"text": text_or_chunks}
-                        )
-                        return result.content[0].text
-            return run_async(summarize_async())
+            # {"text_handle": ...} makes the server read the text from the shared artifact store
+            arguments = text_or_chunks if isinstance(text_or_chunks, dict) and "text_handle" in text_or_chunks else {"text": text_or_chunks}
+            content = run_async(call_mcp_tool(
+                "server/summarizer_qna_server.py",
+                "summarize_text",
+                arguments
+            ))
+            return content[0].text
         return Tool(
             name="Summarizer",
             description="Summarizes text or chunks using the MCP summarizer tool.",
             func=summarize
         )
 
+    def ingest_tool(self, pdf_path: str, options: Optional[dict] = None) -> dict:
+        """Runs extract -> chunk -> embed -> store inside the processing server; returns doc_id, counts and timings."""
+        content = run_async(call_mcp_tool(
+            "server/pdf_processing_server.py",
+            "ingest_pdf",
+            {"pdf_path": pdf_path, "options": options or {}}
+        ))
+        result = json.loads(content[0].text)
+        if "error" in result:
+            raise ValueError(f"Failed to ingest {pdf_path}: {result['error']}")
+        return result
+
+    def release_artifact(self, handle: str) -> None:
+        run_async(call_mcp_tool(
+            "server/pdf_processing_server.py",
+            "release_artifact",
+            {"handle": handle}
+        ))
+
+    def bulk_qna_tool(self, doc_id: str, questions: List[str], options: Optional[dict] = None, on_result=None) -> dict:
+        """Answers many questions about one document in one answer_questions call; on_result gets each answer as it streams in."""
+        async def progress(done, total, message):
+            if on_result and message:
+                on_result(json.loads(message))
+        content = run_async(call_mcp_tool(
+            "server/summarizer_qna_server.py",
+            "answer_questions",
+            {"doc_id": doc_id, "questions": questions, **(options or {})},
+            progress_callback=progress
+        ))
+        if content and not content[0].text.lstrip().startswith("{"):
+            raise ValueError(content[0].text)
+        return json.loads(content[0].text)
+
     def qna_tool(self, question: str, doc_id: str, top_k: int = 5) -> str:
-        async def qna_async():
-            server_params = StdioServerParameters(
-                command="python",
-                args=["server/summarizer_qna_server.py"],
-            )
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    result = await session.call_tool(
-                        "answer_question",
-                        arguments={"question": question, "doc_id": doc_id, "top_k": top_k}
-                    )
-                    return result.content[0].text
-        return run_async(qna_async())
+        content = run_async(call_mcp_tool(
+            "server/summarizer_qna_server.py",
+            "answer_question",
+            {"question": question, "doc_id": doc_id, "top_k": top_k}
+        ))
+        return content[0].text
 
 class DocumentProcessingPipeline:
     """
     Orchestrates the document processing workflow using LangChain tools.
     Provides methods to get a summary and answer questions about the document.
+    Ingest runs inside the processing server in page windows (window_pages, default 20), so the
+    document text, chunks and embeddings never pass through or stay in this process.
+    memory_ceiling_mb halves the window whenever the server's RSS exceeds it, and fails the ingest if
+    the RSS stays above it with one-page windows.
+    With lazy=True (default: LAZY_INGEST=1) the constructor only builds a cheap page index; pages are
+    ingested in the background, those matching a question first, and answers state the pages searched.
+    force=True ingests again even if the document catalog already holds the document (benchmarks).
     """
-    def __init__(self, pdf_path: str, chunk_size: int = 500):
+    def __init__(
+        self,
+        pdf_path: str,
+        chunk_size: int = 500,
+        window_pages: Optional[int] = None,
+        memory_ceiling_mb: Optional[float] = None,
+        lazy: Optional[bool] = None,
+        force: bool = False
+    ):
         self.pdf_path = pdf_path
         self.chunk_size = chunk_size
+        self.window_pages = window_pages
+        self.memory_ceiling_mb = memory_ceiling_mb
+        self.force = force
+        self.lazy = lazy if lazy is not None else os.getenv("LAZY_INGEST", "0").lower() in ("1", "true")
+        self.lazy_ingest: Optional[LazyIngest] = None
         self.text: Optional[str] = None
-        self.chunks: Optional[List[str]] = None
-        self.embeddings: Optional[List[List[float]]] = None
-        # Sanitize doc_id for ChromaDB: use file name, replace spaces and invalid chars
-        base_name = os.path.basename(pdf_path)
-        doc_id = os.path.splitext(base_name)[0]
-        doc_id = re.sub(r'[^a-zA-Z0-9._-]', '_', doc_id)  # Only allow valid chars
-        doc_id = doc_id.strip('_')  # Remove leading/trailing underscores
-        if len(doc_id) < 3:
-            doc_id = f"doc_{doc_id}"
-        self.doc_id = doc_id
+        self.text_handle: Optional[str] = None
+        self.doc_id: Optional[str] = None  # Content-hash ID assigned by the document catalog
         self.agents = DocumentAgents()
-        self.vector_store = VectorStore()
+        self.vector_store = get_vector_store()
         self.tracer = get_tracer("pdf_processor")
         self.monitor = LLMMonitor()
+        self.ingest_result: Optional[dict] = None
         self._process_document()
 
     def _process_document(self):
-        """Runs the pipeline: extract -> chunk -> embed -> store."""
+        """Runs the pipeline (extract -> chunk -> embed -> store) in the processing server."""
         with self.tracer.start_as_current_span("process_document") as span:
             span.set_attribute("document_path", self.pdf_path)
-            start_time = time.time()
-
-            # Extract text
-            with self.tracer.start_span("extract_text") as extract_span:
-                self.text = self.agents.pdf_extractor_tool().run(self.pdf_path)
-                extract_span.set_attribute("text_length", len(self.text))
-
-            # Chunk text
-            with self.tracer.start_span("chunk_text") as chunk_span:
-                self.chunks = self.agents.chunker_tool().run(self.text, self.chunk_size)
-                chunk_span.set_attribute("chunk_count", len(self.chunks))
-
-            # Generate embeddings
-            with self.tracer.start_span("generate_embeddings") as embed_span:
-                start_embed = time.time()
-                self.embeddings = self.agents.embedder_tool().run({"text_chunks": self.chunks})
-                embed_time = (time.time() - start_embed) * 1000  # ms
-                embed_span.set_attribute("embedding_count", len(self.embeddings))
-
-                # Log embeddings to Arize Phoenix (no print)
-                for chunk, embedding in zip(self.chunks, self.embeddings):
-                    self.monitor.log_embedding(
-                        text=chunk,
-                        embedding=embedding,
-                        metadata={
-                            "document_path": self.pdf_path,
-                            "chunk_size": self.chunk_size
-                        }
-                    )
-
-            # Store in vector database
-            with self.tracer.start_span("store_vectors") as store_span:
-                self.vector_store.store_document(
-                    doc_id=self.doc_id,
-                    chunks=self.chunks,
-                    embeddings=self.embeddings,
-                    metadata={"path": self.pdf_path}
-                )
-                store_span.set_attribute("stored_vectors", len(self.embeddings))
-
-            # Set overall processing time
-            span.set_attribute("processing_time_ms", (time.time() - start_time) * 1000)
+            if self.lazy:
+                self.lazy_ingest = LazyIngest(self.pdf_path, chunk_size=self.chunk_size, batch_pages=self.window_pages or 4)
+                self.doc_id = self.lazy_ingest.doc_id
+                span.set_attribute("page_count", self.lazy_ingest.page_count)
+                return
+            options = {"chunk_size": self.chunk_size}
+            if self.window_pages:
+                options["window_pages"] = self.window_pages
+            if self.memory_ceiling_mb:
+                options["memory_ceiling_mb"] = self.memory_ceiling_mb
+            if self.force:
+                options["force"] = True
+            self.ingest_result = self.agents.ingest_tool(self.pdf_path, options)
+            self.doc_id = self.ingest_result["doc_id"]
+            self.text_handle = self.ingest_result.get("text_handle")
+            span.set_attribute("cached", self.ingest_result["cached"])
+            span.set_attribute("page_count", self.ingest_result["page_count"])
+            span.set_attribute("chunk_count", self.ingest_result["chunk_count"])
+            for stage, ms in self.ingest_result["timings_ms"].items():
+                span.set_attribute(f"{stage}_ms", ms)
 
     def get_summary(self) -> str:
         """Returns a summary of the document."""
         with self.tracer.start_as_current_span("get_summary") as span:
             start_time = time.time()
-            summary = self.agents.summarizer_tool().run(self.text)
-            
+            if self.text_handle:
+                # The summarizer reads the text ingest wrote to the artifact store; only the handle is sent
+                summary = self.agents.summarizer_tool().run({"text_handle": self.text_handle})
+                prompt = f"Summarize the document in artifact {self.text_handle}"
+            else:
+                if self.text is None:
+                    self.text = self.agents.pdf_extractor_tool().run(self.pdf_path)
+                summary = self.agents.summarizer_tool().run(self.text)
+                prompt = f"Summarize the following text: {self.text[:100]}..."
+
             # Log LLM interaction
             self.monitor.log_llm_interaction(
-                prompt=f"Summarize the following text: {self.text[:100]}...",
+                prompt=prompt,
                 response=summary,
                 model="gpt-4-turbo-preview",
                 metadata={
@@ -237,12 +218,28 @@ class DocumentProcessingPipeline:
             
             return summary
 
+    def close(self) -> None:
+        """Stops a lazy ingest in progress and releases this pipeline's reference to the document text."""
+        if self.lazy_ingest:
+            self.lazy_ingest.stop()
+        if self.text_handle:
+            self.agents.release_artifact(self.text_handle)
+            self.text_handle = None
+
     def ask_question(self, question: str, top_k: int = 5) -> str:
         """Answers a question based on the document content."""
         with self.tracer.start_as_current_span("ask_question") as span:
             span.set_attribute("question", question)
             start_time = time.time()
 
+            if self.lazy_ingest:
+                with self.tracer.start_span("prioritize_pages") as prioritize_span:
+                    pages = self.lazy_ingest.prioritize(question)
+                    self.lazy_ingest.wait_for(pages, timeout=float(os.getenv("LAZY_INGEST_WAIT_S", "60")))
+                    covered = self.lazy_ingest.covered_pages()  # What retrieval can see, before ingest moves on
+                    prioritize_span.set_attribute("prioritized_pages", str(pages))
+                    prioritize_span.set_attribute("pages_covered", len(covered))
+
             # Get question embedding
             with self.tracer.start_span("embed_question") as embed_span:
                 question_embedding = self.agents.embedder_tool().run({"text_chunks": [question]})[0]
@@ -275,8 +272,55 @@ class DocumentProcessingPipeline:
                         "latency_ms": (time.time() - start_time) * 1000
                     }
                 )
+                if self.lazy_ingest:
+                    answer = f"{answer}\n\n{self.lazy_ingest.coverage_note(covered)}"
                 return answer
 
+    def answer_questions(
+        self,
+        questions: List[str],
+        top_k: int = 5,
+        max_concurrency: Optional[int] = None,
+        group_shared_context: bool = False,
+        on_result=None
+    ) -> dict:
+        """
+        Answers a questionnaire about the document: one batched embedding and retrieval, concurrent
+        LLM calls, answers passed to on_result as they finish. Returns answers in question order and
+        the server's timings; round_trip_ms is the end-to-end time seen here.
+        """
+        with self.tracer.start_as_current_span("answer_questions") as span:
+            span.set_attribute("questions", len(questions))
+            start_time = time.time()
+            if self.lazy_ingest:
+                with self.tracer.start_span("prioritize_pages") as prioritize_span:
+                    pages = []
+                    for question in questions:
+                        pages += [page for page in self.lazy_ingest.prioritize(question, limit=4) if page not in pages]
+                    self.lazy_ingest.wait_for(pages, timeout=float(os.getenv("LAZY_INGEST_WAIT_S", "60")))
+                    covered = self.lazy_ingest.covered_pages()  # What retrieval can see, before ingest moves on
+                    prioritize_span.set_attribute("prioritized_pages", str(pages))
+                    prioritize_span.set_attribute("pages_covered", len(covered))
+            result = self.agents.bulk_qna_tool(self.doc_id, questions, {
+                "top_k": top_k,
+                "max_concurrency": max_concurrency,
+                "group_shared_context": group_shared_context
+            }, on_result)
+            result["round_trip_ms"] = round((time.time() - start_time) * 1000, 2)
+            if self.lazy_ingest:
+                result["coverage_note"] = self.lazy_ingest.coverage_note(covered)
+            for entry in result["answers"]:
+                self.monitor.log_llm_interaction(
+                    prompt=entry["question"],
+                    response=entry["answer"] or "",
+                    model="gpt-4-turbo-preview",
+                    metadata={"document_path": self.pdf_path, "operation": "answer_questions"},
+                    latency_ms=entry["latency_ms"]
+                )
+            span.set_attribute("llm_calls", result["llm_calls"])
+            span.set_attribute("round_trip_ms", result["round_trip_ms"])
+            return result
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Agentic Document Processing Pipeline (LangChain-style)")
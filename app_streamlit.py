@@ -1,7 +1,9 @@
 import streamlit as st
 from modules.pipeline import DocumentProcessingPipeline
+import hashlib
 import tempfile
 import os
+from pathlib import Path
 from phoenix.otel import register
 
 register(
@@ -10,23 +12,57 @@ register(
     headers={"authorization": f"Bearer {os.getenv('PHOENIX_API_KEY')}"} if os.getenv('PHOENIX_API_KEY') else None
 )
 
+# Uploaded PDFs are stored once per content hash; only the most recent ones are kept on disk
+UPLOAD_DIR = Path(os.getenv("PDF_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "pdf_assistant_uploads")))
+MAX_CACHED_DOCUMENTS = int(os.getenv("PDF_UPLOAD_CACHE_SIZE", "8"))
+
+def save_upload(data: bytes) -> tuple:
+    """
+    Writes uploaded bytes to a file named after their SHA-256 digest.
+    Re-uploading the same document reuses the existing file.
+    Returns:
+        (digest, pdf_path)
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    pdf_path = UPLOAD_DIR / f"{digest[:32]}.pdf"
+    if pdf_path.exists():
+        pdf_path.touch()
+    else:
+        with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, pdf_path)
+    cleanup_uploads(keep=pdf_path)
+    return digest, str(pdf_path)
+
+def cleanup_uploads(keep: Path) -> None:
+    """Removes the least recently used uploads beyond MAX_CACHED_DOCUMENTS."""
+    uploads = sorted(UPLOAD_DIR.glob("*.pdf"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in uploads[MAX_CACHED_DOCUMENTS:]:
+        if path != keep:
+            path.unlink(missing_ok=True)
+
+@st.cache_resource(max_entries=MAX_CACHED_DOCUMENTS, show_spinner="Processing PDF...")
+def load_pipeline(digest: str, pdf_path: str) -> DocumentProcessingPipeline:
+    """
+    Ingests a document once per content hash and shares the pipeline across sessions and reruns.
+    The cache never calls close() on the pipelines it evicts; they release their text_handle and stop
+    their lazy ingest when garbage-collected (see DocumentProcessingPipeline).
+    """
+    return DocumentProcessingPipeline(pdf_path)
+
 st.set_page_config(page_title="PDF QnA & Summarizer (MCP-powered)")
 st.title("PDF QnA & Summarizer (MCP-powered)")
 
 uploaded_file = st.file_uploader("Upload a PDF", type=["pdf"])
 
 if uploaded_file:
-    # Save to a temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(uploaded_file.read())
-        pdf_path = tmp.name
-
-    if "pipeline" not in st.session_state or st.session_state.get("pdf_path") != pdf_path:
-        st.session_state.pipeline = DocumentProcessingPipeline(pdf_path)
-        st.session_state.pdf_path = pdf_path
-        st.session_state.chat_history = []
+    digest, pdf_path = save_upload(uploaded_file.getvalue())
+    pipeline = load_pipeline(digest, pdf_path)
 
-    pipeline = st.session_state.pipeline
+    if st.session_state.get("doc_hash") != digest:
+        st.session_state.doc_hash = digest
+        st.session_state.chat_history = []
 
     st.subheader("Summary")
     if st.button("Get Summary"):
@@ -47,4 +83,4 @@ if uploaded_file:
             st.markdown(f"**You:** {q}")
             st.markdown(f"**Assistant:** {a}")
 else:
-    st.info("Please upload a PDF to get started.") 
\ No newline at end of file
+    st.info("Please upload a PDF to get started.")
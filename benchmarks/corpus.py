@@ -0,0 +1,87 @@
+"""
+Synthetic PDF corpus for benchmarks.
+
+Text-layer PDFs are written with PyMuPDF; "scanned" PDFs are the same pages rendered to
+grayscale images and re-embedded, so they have no text layer and go through OCR.
+Each PDF is written next to a <name>.truth.json file holding the ground-truth text per page.
+"""
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import fitz
+
+WORDS = (
+    "agreement party term payment invoice delivery service period notice clause liability "
+    "warranty contract schedule amount total report revenue quarter growth margin customer "
+    "supplier product order region market analysis summary section figure table result "
+    "method data value rate cost budget forecast policy review audit compliance risk "
+    "control process system document page record account balance statement annual "
+    "the of and to in for with on by from at as is are was be this that which"
+).split()
+
+PAGE_RECT = fitz.Rect(0, 0, 595, 842)  # A4 in points
+TEXT_RECT = fitz.Rect(50, 50, 545, 792)
+
+def page_text(rng: random.Random, page_number: int, words_per_page: int = 300) -> str:
+    """Deterministic pseudo-prose for one page, with a title line."""
+    words = [rng.choice(WORDS) for _ in range(words_per_page)]
+    lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    return f"Section {page_number}: {words[0].title()} {words[1].title()}\n" + "\n".join(lines)
+
+def write_text_pdf(path: str, pages: int, seed: int = 0, words_per_page: int = 300) -> List[str]:
+    """Writes a PDF with a real text layer. Returns the ground-truth text per page."""
+    rng = random.Random(seed)
+    truth = []
+    doc = fitz.open()
+    for page_number in range(1, pages + 1):
+        text = page_text(rng, page_number, words_per_page)
+        page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+        page.insert_textbox(TEXT_RECT, text, fontsize=10, fontname="helv")
+        truth.append(text)
+    doc.save(path)
+    doc.close()
+    return truth
+
+def write_scanned_pdf(path: str, pages: int, seed: int = 0, words_per_page: int = 300, dpi: int = 200) -> List[str]:
+    """Writes an image-only PDF by rasterizing a text PDF page by page. Returns the ground truth."""
+    source_path = str(Path(path).with_suffix(".source.pdf"))
+    truth = write_text_pdf(source_path, pages, seed, words_per_page)
+    source = fitz.open(source_path)
+    doc = fitz.open()
+    for source_page in source:
+        pix = source_page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+        page.insert_image(PAGE_RECT, pixmap=pix)
+    doc.save(path, deflate=True)
+    doc.close()
+    source.close()
+    Path(source_path).unlink()
+    return truth
+
+def build_corpus(out_dir: str, page_counts: List[int], kinds=("text", "scanned"), seed: int = 0) -> List[Dict]:
+    """
+    Generates one PDF per (kind, page count), reusing files that already exist.
+    Returns a list of {"name", "kind", "pages", "path", "truth_path"} entries.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    writers = {"text": write_text_pdf, "scanned": write_scanned_pdf}
+    corpus = []
+    for kind in kinds:
+        for pages in page_counts:
+            name = f"{kind}_{pages}p"
+            path = out / f"{name}.pdf"
+            truth_path = out / f"{name}.truth.json"
+            if not (path.exists() and truth_path.exists()):
+                truth = writers[kind](str(path), pages, seed=seed + pages)
+                truth_path.write_text(json.dumps(truth))
+            corpus.append({
+                "name": name,
+                "kind": kind,
+                "pages": pages,
+                "path": str(path),
+                "truth_path": str(truth_path),
+            })
+    return corpus
@@ -0,0 +1,80 @@
+"""
+Text-extraction backend benchmark.
+
+Extracts every page of the text PDFs of the synthetic corpus (plus any --pdf files) with each
+backend of server/extract_backends.py and reports pages/sec and output agreement:
+  - vs_truth:  similarity to the ground-truth text (synthetic corpus only)
+  - vs_pypdf2: similarity to the PyPDF2 output, i.e. how much switching backends changes the text
+
+Usage (from the project root):
+    python -m benchmarks.extract_benchmark --pages 10 100 --out extract.json
+    python -m benchmarks.extract_benchmark --pages 10 --pdf docs/report.pdf --backends pypdf2 pymupdf
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.ocr_benchmark import accuracy
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def extract_pages(path: str, backend: str):
+    """Returns (text per page, seconds spent), counting open and close."""
+    from server.extract_backends import open_document
+    start = time.perf_counter()
+    with open_document(path, backend) as doc:
+        texts = [doc.page_text(i) for i in range(doc.page_count)]
+    return texts, time.perf_counter() - start
+
+def mean_accuracy(expected, actual) -> dict:
+    scores = [accuracy(e, a) for e, a in zip(expected, actual)]
+    return {key: sum(s[key] for s in scores) / len(scores) for key in ("word_accuracy", "char_accuracy")}
+
+def main():
+    parser = argparse.ArgumentParser(description="Pages/sec and output agreement per text backend")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--pdf", nargs="*", default=[], help="Additional PDFs to include (no ground truth)")
+    parser.add_argument("--backends", nargs="+", help="Backends to compare (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per document; the fastest is reported")
+    parser.add_argument("--corpus-dir", help="Where to generate/reuse the synthetic PDFs")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from benchmarks.corpus import build_corpus
+    from server.extract_backends import BACKENDS
+
+    backends = args.backends or list(BACKENDS)
+    corpus = build_corpus(args.corpus_dir or tempfile.mkdtemp(prefix="pdf_extract_bench_"), args.pages, kinds=("text",))
+    corpus += [{"name": Path(p).name, "path": p} for p in args.pdf]
+    results = []
+    for entry in corpus:
+        truth = json.loads(Path(entry["truth_path"]).read_text()) if "truth_path" in entry else None
+        reference, _ = extract_pages(entry["path"], "pypdf2")
+        for backend in backends:
+            texts, elapsed = None, float("inf")
+            for _ in range(max(1, args.repeat)):
+                texts, seconds = extract_pages(entry["path"], backend)
+                elapsed = min(elapsed, seconds)
+            results.append({
+                "document": entry["name"],
+                "backend": backend,
+                "pages": len(texts),
+                "pages_per_s": len(texts) / elapsed,
+                "vs_truth": mean_accuracy(truth, texts) if truth else None,
+                "vs_pypdf2": mean_accuracy(reference, texts),
+            })
+
+    print(f"{'document':24} {'backend':15} {'pages/s':>9} {'truth word':>11} {'pypdf2 word':>12} {'pypdf2 char':>12}")
+    for r in results:
+        truth_word = f"{r['vs_truth']['word_accuracy']:11.3f}" if r["vs_truth"] else f"{'-':>11}"
+        print(f"{r['document']:24} {r['backend']:15} {r['pages_per_s']:9.1f} {truth_word} "
+              f"{r['vs_pypdf2']['word_accuracy']:12.3f} {r['vs_pypdf2']['char_accuracy']:12.3f}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
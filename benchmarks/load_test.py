@@ -0,0 +1,130 @@
+"""
+Load test of the model clients against the local OpenAI stand-in.
+
+Spawns server/openai_standin.py (unless --base-url points at a running one), then issues
+concurrent embedding and chat calls through server.llm_clients and reports throughput,
+latency percentiles and errors by type.
+
+With --scheduler, calls go through server/model_scheduler.py the way the servers make them
+(chat as interactive, embeddings as bulk), so retries, adaptive concurrency and priorities
+can be checked against injected 429s (--rate-limit-rate, --rpm-limit).
+
+Usage (from the project root):
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --batch-size 64 --rate-limit-rate 0.05
+    python -m benchmarks.load_test --requests 200 --concurrency 32 --rate-limit-rate 0.1 --rpm-limit 600 --scheduler
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.run_benchmarks import percentile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def wait_until_up(base_url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/models", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Stand-in did not come up at {base_url}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test model clients against the OpenAI stand-in")
+    parser.add_argument("--base-url", help="Use an already running stand-in instead of spawning one")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per embedding request")
+    parser.add_argument("--chat-ratio", type=float, default=0.2, help="Fraction of requests that are chat completions")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--token-rate", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Stand-in answers 429 above this many requests per minute")
+    parser.add_argument("--scheduler", action="store_true", help="Route calls through the model scheduler")
+    parser.add_argument("--out", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    standin = None
+    base_url = args.base_url
+    if not base_url:
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+        standin = subprocess.Popen([
+            sys.executable, str(PROJECT_ROOT / "server" / "openai_standin.py"), "--port", str(args.port),
+            "--latency-ms", str(args.latency_ms), "--token-rate", str(args.token_rate),
+            "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+            "--rpm-limit", str(args.rpm_limit),
+        ])
+    try:
+        wait_until_up(base_url)
+        os.environ["LLM_PROVIDER"] = "local"
+        os.environ["OPENAI_BASE_URL"] = base_url
+        sys.path.insert(0, str(PROJECT_ROOT))
+        from server.llm_clients import get_chat_model, get_embeddings
+        from server.model_scheduler import get_scheduler, estimate_tokens, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+        embedder = get_embeddings()
+        llm = get_chat_model()
+        scheduler = get_scheduler() if args.scheduler else None
+        chat_every = int(1 / args.chat_ratio) if args.chat_ratio else 0
+
+        def call(fn, priority, payload, stage):
+            if scheduler is None:
+                return fn()
+            return scheduler.run(fn, priority=priority, tokens=estimate_tokens(payload), stage=stage)
+
+        def one_request(i):
+            is_chat = chat_every and i % chat_every == 0
+            start = time.perf_counter()
+            try:
+                if is_chat:
+                    prompt = f"Question {i}: summarize the document."
+                    call(lambda: llm.invoke(prompt), PRIORITY_INTERACTIVE, prompt, "llm")
+                else:
+                    texts = [f"chunk {i}-{j}" for j in range(args.batch_size)]
+                    call(lambda: embedder.embed_documents(texts), PRIORITY_BULK, texts, "embed_batch")
+                error = None
+            except Exception as e:
+                error = type(e).__name__
+            return ("chat" if is_chat else "embed", (time.perf_counter() - start) * 1000, error)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(one_request, range(args.requests)))
+        wall_s = time.perf_counter() - start
+
+        report = {"wall_s": wall_s, "requests_per_s": args.requests / wall_s, "kinds": {}}
+        for kind in ("embed", "chat"):
+            latencies = [ms for k, ms, err in results if k == kind and err is None]
+            errors = Counter(err for k, _, err in results if k == kind and err)
+            if latencies or errors:
+                report["kinds"][kind] = {
+                    "ok": len(latencies),
+                    "errors": dict(errors),
+                    "p50_ms": percentile(latencies, 50) if latencies else None,
+                    "p95_ms": percentile(latencies, 95) if latencies else None,
+                }
+        if scheduler:
+            report["scheduler"] = scheduler.stats()
+        stats_url = base_url.rsplit("/v1", 1)[0] + "/stats"
+        report["standin"] = json.loads(urllib.request.urlopen(stats_url, timeout=2).read())
+        print(json.dumps(report, indent=2))
+        if args.out:
+            Path(args.out).write_text(json.dumps(report, indent=2))
+    finally:
+        if standin:
+            standin.terminate()
+            standin.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Ingest peak-memory benchmark.
+
+Ingests text PDFs of growing page counts with DocumentProcessingPipeline at each window size
+(window_pages; 0 processes the whole document as one window, i.e. all text, chunks and
+embeddings in memory at once) and reports the peak RSS of the client plus its MCP server
+processes. With a fixed window the peak should stay flat as the page count grows.
+
+Usage (from the project root):
+    python -m benchmarks.memory_benchmark --pages 50 200 800 --window-pages 0 20 --out memory.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def ingest(entry: dict, window_pages: int, memory_ceiling_mb) -> dict:
+    from agents import DocumentProcessingPipeline
+    from benchmarks.run_benchmarks import PeakRSSSampler
+    start = time.perf_counter()
+    with PeakRSSSampler() as sampler:
+        DocumentProcessingPipeline(
+            entry["path"],
+            window_pages=window_pages or entry["pages"],
+            memory_ceiling_mb=memory_ceiling_mb,
+            force=True  # Every mode ingests; otherwise later modes would only hit the document catalog
+        )
+    return {
+        "document": entry["name"],
+        "pages": entry["pages"],
+        "mode": f"window={window_pages}" if window_pages else "whole document",
+        "peak_rss_mb": sampler.peak / (1024 * 1024),
+        "seconds": time.perf_counter() - start,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of ingest by page count and window size")
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--window-pages", type=int, nargs="+", default=[0, 20], help="0 = whole document at once")
+    parser.add_argument("--memory-ceiling-mb", type=float)
+    parser.add_argument("--corpus-dir", help="Where to generate/reuse the synthetic PDFs")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    os.environ.setdefault("VECTOR_DB_DIR", tempfile.mkdtemp(prefix="pdf_memory_vector_db_"))
+    sys.path[:0] = [str(PROJECT_ROOT), str(PROJECT_ROOT / "server")]
+    from benchmarks.corpus import build_corpus
+
+    corpus = build_corpus(args.corpus_dir or tempfile.mkdtemp(prefix="pdf_memory_bench_"), args.pages, kinds=("text",))
+    results = []
+    for entry in corpus:
+        for window_pages in args.window_pages:
+            results.append(ingest(entry, window_pages, args.memory_ceiling_mb))
+
+    print(f"{'pages':>6} {'mode':16} {'peak RSS MB':>12} {'seconds':>8}")
+    for r in results:
+        print(f"{r['pages']:6} {r['mode']:16} {r['peak_rss_mb']:12.1f} {r['seconds']:8.2f}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+OCR throughput/accuracy benchmark.
+
+OCRs the scanned PDFs of the synthetic corpus under several settings and reports pages/sec
+and accuracy against the ground truth for each:
+  - legacy:          72 DPI RGB pixmap -> PNG bytes -> PIL decode, chi_sim+eng (the previous path)
+  - dpi=<n|adaptive> grayscale raw-buffer path of server/ocr.py at a fixed or adaptive DPI
+  - lang=<...>       language packs used for recognition
+
+Usage (from the project root, requires the tesseract binary):
+    python -m benchmarks.ocr_benchmark --pages 5 --dpi adaptive 150 300 --lang eng chi_sim+eng --out ocr.json
+"""
+import argparse
+import difflib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def accuracy(expected: str, actual: str) -> dict:
+    """Word- and character-level similarity (difflib ratio) between ground truth and OCR output."""
+    return {
+        "word_accuracy": difflib.SequenceMatcher(None, expected.split(), actual.split(), autojunk=False).ratio(),
+        "char_accuracy": difflib.SequenceMatcher(None, " ".join(expected.split()), " ".join(actual.split()), autojunk=False).ratio(),
+    }
+
+def legacy_ocr(page, lang: str) -> str:
+    from PIL import Image
+    from pytesseract import image_to_string
+    pix = page.get_pixmap()
+    return image_to_string(Image.open(io.BytesIO(pix.tobytes())), lang=lang)
+
+def run_setting(entry: dict, name: str, ocr_page) -> dict:
+    import fitz
+    truth = json.loads(Path(entry["truth_path"]).read_text())
+    doc = fitz.open(entry["path"])
+    scores = []
+    start = time.perf_counter()
+    for page_index in range(doc.page_count):
+        text = ocr_page(doc.load_page(page_index))
+        scores.append(accuracy(truth[page_index], text))
+    elapsed = time.perf_counter() - start
+    return {
+        "setting": name,
+        "document": entry["name"],
+        "pages": doc.page_count,
+        "pages_per_s": doc.page_count / elapsed,
+        "word_accuracy": sum(s["word_accuracy"] for s in scores) / len(scores),
+        "char_accuracy": sum(s["char_accuracy"] for s in scores) / len(scores),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR throughput and accuracy per setting")
+    parser.add_argument("--pages", type=int, nargs="+", default=[5])
+    parser.add_argument("--dpi", nargs="+", default=["adaptive", "150", "300"], help="Fixed DPI values and/or 'adaptive'")
+    parser.add_argument("--lang", nargs="+", default=["eng", "chi_sim+eng"])
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the previous 72 DPI PNG round-trip path")
+    parser.add_argument("--corpus-dir", help="Where to generate/reuse the synthetic PDFs")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from benchmarks.corpus import build_corpus
+    from server.ocr import OCREngine
+
+    corpus = build_corpus(args.corpus_dir or tempfile.mkdtemp(prefix="pdf_ocr_bench_"), args.pages, kinds=("scanned",))
+    results = []
+    for entry in corpus:
+        if not args.no_legacy:
+            results.append(run_setting(entry, "legacy lang=chi_sim+eng", lambda page: legacy_ocr(page, "chi_sim+eng")))
+        for dpi in args.dpi:
+            engine = OCREngine(dpi=None if dpi == "adaptive" else int(dpi))
+            for lang in args.lang:
+                name = f"{engine.backend} dpi={dpi} lang={lang}"
+                results.append(run_setting(entry, name, lambda page: engine.recognize(engine.render(page), lang)))
+
+    print(f"{'document':14} {'setting':45} {'pages/s':>8} {'word acc':>9} {'char acc':>9}")
+    for r in results:
+        print(f"{r['document']:14} {r['setting']:45} {r['pages_per_s']:8.2f} {r['word_accuracy']:9.3f} {r['char_accuracy']:9.3f}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+End-to-end benchmark harness.
+
+Runs each stage (extract, chunk, embed, store, retrieve) and optionally the full
+agents.DocumentProcessingPipeline over a synthetic corpus, using the deterministic
+offline embedding/LLM stand-ins (LLM_PROVIDER=fake), and writes throughput, latency
+percentiles and peak RSS to a JSON file.
+
+Usage (from the project root):
+    python -m benchmarks.run_benchmarks run --pages 10 100 --kinds text scanned --out bench.json
+    python -m benchmarks.run_benchmarks run --pages 20 --pipeline --out bench.json
+    python -m benchmarks.run_benchmarks compare baseline.json bench.json --threshold 10
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import psutil
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100): the smallest value with at least q% of values at or below it."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class PeakRSSSampler:
+    """Samples the RSS of this process plus all children (MCP servers) and keeps the maximum."""
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> int:
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._sample())
+
+def measure(fn: Callable[[int], object], repeat: int, items: int) -> Dict:
+    """
+    Calls fn(run_index) `repeat` times and summarizes latency, throughput and peak RSS.
+    Args:
+        fn: Callable doing one run of the stage
+        repeat: Number of runs
+        items: Units processed per run (pages, chunks, queries) for throughput
+    """
+    durations = []
+    with PeakRSSSampler() as sampler:
+        for run in range(repeat):
+            start = time.perf_counter()
+            fn(run)
+            durations.append((time.perf_counter() - start) * 1000)
+    mean_ms = sum(durations) / len(durations)
+    return {
+        "runs": repeat,
+        "items": items,
+        "mean_ms": mean_ms,
+        "p50_ms": percentile(durations, 50),
+        "p95_ms": percentile(durations, 95),
+        "min_ms": min(durations),
+        "max_ms": max(durations),
+        "items_per_s": items / (mean_ms / 1000) if mean_ms else None,
+        "peak_rss_mb": sampler.peak / (1024 * 1024),
+    }
+
+def run_stages(entry: Dict, repeat: int, queries: int, chunk_size: int) -> Dict:
+    """Benchmarks each stage in-process for one corpus document."""
+    from pdf_processing_server import extractor, chunk_text
+    from server.llm_clients import get_embeddings
+    from server.vector_store import VectorStore
+
+    results = {}
+    state = {}
+
+    def extract(run):
+        state["text"] = extractor.extract_content(entry["path"], None)
+    results["extract"] = measure(extract, repeat, entry["pages"])
+
+    def chunk(run):
+        state["chunks"] = chunk_text(state["text"], chunk_size)
+    results["chunk"] = measure(chunk, repeat, entry["pages"])
+
+    embedder = get_embeddings()
+    def embed(run):
+        state["vectors"] = embedder.embed_documents(state["chunks"])
+    results["embed"] = measure(embed, repeat, len(state["chunks"]))
+
+    store = VectorStore()
+    def store_vectors(run):
+        store.store_document(f"{entry['name']}_r{run}", state["chunks"], state["vectors"], {"path": entry["path"]})
+    results["store"] = measure(store_vectors, repeat, len(state["chunks"]))
+
+    query_vectors = embedder.embed_documents([f"question {i} about {entry['name']}" for i in range(queries)])
+    def retrieve(run):
+        for vector in query_vectors:
+            store.query_similar(f"{entry['name']}_r{run}", vector, 5)
+    results["retrieve"] = measure(retrieve, repeat, queries)
+    return results
+
+def run_pipeline(entry: Dict, repeat: int) -> Dict:
+    """Benchmarks ingest plus one question through agents.DocumentProcessingPipeline (spawns the MCP servers)."""
+    from agents import DocumentProcessingPipeline
+
+    results = {}
+    state = {}
+
+    def ingest(run):
+        # force: runs after the first would otherwise measure document catalog hits
+        state["pipeline"] = DocumentProcessingPipeline(entry["path"], force=True)
+    results["pipeline_ingest"] = measure(ingest, repeat, entry["pages"])
+
+    def ask(run):
+        state["pipeline"].ask_question("What is the total amount in the agreement?")
+    results["pipeline_question"] = measure(ask, repeat, 1)
+    return results
+
+def run(args) -> Dict:
+    # Offline stand-ins and a throwaway vector store must be configured before the server modules are imported
+    os.environ["LLM_PROVIDER"] = "fake"
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="pdf_bench_"))
+    os.environ["VECTOR_DB_DIR"] = str(work_dir / "vector_db")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    sys.path[:0] = [str(PROJECT_ROOT), str(PROJECT_ROOT / "server")]
+
+    from benchmarks.corpus import build_corpus
+
+    corpus = build_corpus(args.corpus_dir or str(work_dir / "corpus"), args.pages, args.kinds)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"pages": args.pages, "kinds": args.kinds, "repeat": args.repeat, "chunk_size": args.chunk_size},
+        "documents": {},
+    }
+    for entry in corpus:
+        print(f"[bench] {entry['name']}", file=sys.stderr)
+        try:
+            results = run_stages(entry, args.repeat, args.queries, args.chunk_size)
+            if args.pipeline:
+                results.update(run_pipeline(entry, args.repeat))
+        except Exception as e:
+            results = {"error": f"{type(e).__name__}: {e}"}
+        report["documents"][entry["name"]] = {"kind": entry["kind"], "pages": entry["pages"], "stages": results}
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(f"[bench] wrote {args.out}", file=sys.stderr)
+    return report
+
+def compare(args) -> int:
+    """Prints per-stage deltas between two runs. Returns 1 if any stage regressed beyond the threshold."""
+    base = json.loads(Path(args.baseline).read_text())
+    new = json.loads(Path(args.candidate).read_text())
+    regressions = 0
+    print(f"{'document/stage':40} {'mean ms':>22} {'p95 ms':>22} {'peak RSS MB':>22}")
+    for name, doc in new["documents"].items():
+        base_stages = base["documents"].get(name, {}).get("stages", {})
+        for stage, result in doc.get("stages", {}).items():
+            before = base_stages.get(stage)
+            if not before or "mean_ms" not in result or "mean_ms" not in before:
+                continue
+            cells = []
+            for key in ("mean_ms", "p95_ms", "peak_rss_mb"):
+                delta = (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                if key != "peak_rss_mb" and delta > args.threshold:
+                    regressions += 1
+                cells.append(f"{before[key]:9.1f} -> {result[key]:9.1f} ({delta:+6.1f}%)")
+            print(f"{name + '/' + stage:40} " + " ".join(cells))
+    print(f"\n{regressions} latency regression(s) above {args.threshold}%")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF assistant benchmark harness")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmarks and write a JSON report")
+    run_parser.add_argument("--pages", type=int, nargs="+", default=[10, 50], help="Page counts to generate")
+    run_parser.add_argument("--kinds", nargs="+", default=["text", "scanned"], choices=["text", "scanned"])
+    run_parser.add_argument("--repeat", type=int, default=3, help="Runs per stage")
+    run_parser.add_argument("--queries", type=int, default=20, help="Retrieval queries per run")
+    run_parser.add_argument("--chunk-size", type=int, default=500)
+    run_parser.add_argument("--pipeline", action="store_true", help="Also run the full DocumentProcessingPipeline")
+    run_parser.add_argument("--corpus-dir", help="Where to generate/reuse the synthetic PDFs")
+    run_parser.add_argument("--work-dir", help="Scratch directory (default: a new temp dir)")
+    run_parser.add_argument("--out", default="bench_output.json")
+
+    compare_parser = sub.add_parser("compare", help="Diff two JSON reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Server startup benchmark.
+
+Measures, in fresh interpreters, how long importing each server module takes and checks it
+against an import-time budget. Then compares a short tool call (chunk_text) on a cold
+stdio server spawned per call with the same call on a warm streamable-http server.
+
+Usage (from the project root):
+    python -m benchmarks.startup --budget-ms 1000 --repeat 5 --calls 5 --out startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SERVER_MODULES = ["pdf_extractor", "pdf_processing_server", "summarizer_qna_server"]
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path[:0] = [{root!r}, {server!r}]
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+"""
+
+def import_time_ms(module: str) -> float:
+    snippet = IMPORT_SNIPPET.format(root=str(PROJECT_ROOT), server=str(PROJECT_ROOT / "server"), module=module)
+    output = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, check=True, cwd=PROJECT_ROOT)
+    return float(output.stdout.strip().splitlines()[-1])
+
+def heaviest_imports(module: str, top: int = 10):
+    """Top-level packages with the largest cumulative import time according to -X importtime."""
+    snippet = f"import sys; sys.path[:0] = [{str(PROJECT_ROOT)!r}, {str(PROJECT_ROOT / 'server')!r}]; import {module}"
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", snippet], capture_output=True, text=True, cwd=PROJECT_ROOT)
+    totals = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative.isdigit() and "." not in name:
+            totals[name] = max(totals.get(name, 0), int(cumulative) / 1000)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def time_calls(calls: int):
+    from modules.mcp_client import call_mcp_tool, run_async
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        run_async(call_mcp_tool("server/pdf_processing_server.py", "chunk_text", {"text": "lorem ipsum " * 100}))
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(durations), "max_ms": max(durations)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Server import-time and cold/warm call benchmark")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="Import-time budget per server module")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--port", type=int, default=5902)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    os.environ.setdefault("VECTOR_DB_DIR", tempfile.mkdtemp(prefix="pdf_startup_vector_db_"))
+    sys.path.insert(0, str(PROJECT_ROOT))
+    report = {"budget_ms": args.budget_ms, "imports": {}}
+    over_budget = []
+    for module in SERVER_MODULES:
+        samples = [import_time_ms(module) for _ in range(args.repeat)]
+        median = statistics.median(samples)
+        report["imports"][module] = {"median_ms": median, "heaviest": heaviest_imports(module)}
+        if median > args.budget_ms:
+            over_budget.append(module)
+        print(f"{module:25} {median:8.1f} ms {'OVER BUDGET' if median > args.budget_ms else ''}")
+
+    report["cold_stdio_call"] = time_calls(args.calls)
+    server = subprocess.Popen(
+        [sys.executable, "server/pdf_processing_server.py", "--transport", "streamable-http",
+         "--port", str(args.port), "--warm"],
+        cwd=PROJECT_ROOT, env={**os.environ, "PYTHONPATH": str(PROJECT_ROOT)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{args.port}/mcp"
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(url, timeout=1)
+                break
+            except urllib.error.HTTPError:
+                break  # Server is up; a bare GET is not a valid MCP request
+            except OSError:
+                time.sleep(0.2)
+        os.environ["PDF_PROCESSING_SERVER_URL"] = url
+        report["warm_http_call"] = time_calls(args.calls)
+    finally:
+        os.environ.pop("PDF_PROCESSING_SERVER_URL", None)
+        server.terminate()
+        server.wait()
+    print(f"cold stdio call  {report['cold_stdio_call']['median_ms']:8.1f} ms")
+    print(f"warm http call   {report['warm_http_call']['median_ms']:8.1f} ms")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    sys.exit(1 if over_budget else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 import argparse
+import json
 import os
-from mcp.client.stdio import stdio_client, StdioServerParameters
-from mcp.client.session import ClientSession
 from modules.pipeline import DocumentProcessingPipeline
-import asyncio
+from modules.mcp_client import call_mcp_tool, run_async
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
@@ -26,75 +25,22 @@ if not hasattr(HttpExporter, 'shutdown'):
         pass
     HttpExporter.shutdown = _dummy_shutdown
 
-# Helper to call an MCP tool
-async def call_mcp_tool(server_script, tool_name, arguments):
-    server_params = StdioServerParameters(command="python", args=[server_script])
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, arguments=arguments)
-            return result.content
-
-def run_async(coro):
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
-    if loop and loop.is_running():
-        nest_asyncio.apply()
-        return loop.run_until_complete(coro)
-    else:
-        return asyncio.run(coro)
-
 def mcp_qna(pdf_path, question, top_k=5):
-    # 1. Extract text from PDF
-    text_obj = run_async(call_mcp_tool(
+    # 1. Extract, chunk, embed and store inside the processing server; only the doc_id comes back
+    result = run_async(call_mcp_tool(
         "server/pdf_processing_server.py",
-        "extract_pdf_contents",
-        {"pdf_path": pdf_path}
+        "ingest_pdf",
+        {"pdf_path": pdf_path, "options": {"keep_text": False}}
     ))[0]
-    text = text_obj.text if hasattr(text_obj, "text") else str(text_obj)
-
-    # 2. Chunk the extracted text
-    chunks = run_async(call_mcp_tool(
-        "server/pdf_processing_server.py",
-        "chunk_text",
-        {"text": text}
-    ))
-
-    # 3. Embed the chunks AND store in vector DB
-    doc_id = os.path.splitext(os.path.basename(pdf_path))[0]
-    embed_result = run_async(call_mcp_tool(
-        "server/pdf_processing_server.py",
-        "embed_chunks",
-        {"text_chunks": chunks, "doc_id": doc_id}
-    ))
-    # embed_result will be a confirmation message
-
-    # 4. Embed the question
-    q_embedding = run_async(call_mcp_tool(
-        "server/pdf_processing_server.py",
-        "embed_chunks",
-        {"text_chunks": [question]}
-    ))[0]
-    if hasattr(q_embedding, "text"):
-        import json
-        q_embedding = json.loads(q_embedding.text)
-
-    # 5. Retrieve relevant chunks
-    relevant_chunks = run_async(call_mcp_tool(
-        "server/vector_store.py",
-        "search_embeddings",
-        {"doc_id": doc_id, "query_embedding": q_embedding, "top_k": top_k}
-    ))
+    result = json.loads(result.text)
+    if "error" in result:
+        raise ValueError(f"Failed to ingest {pdf_path}: {result['error']}")
 
-    # 6. Call QnA service
+    # 2. Retrieve relevant chunks and answer inside the QnA server
     answer = run_async(call_mcp_tool(
-        "server/qna.py",
+        "server/summarizer_qna_server.py",
         "answer_question",
-        {"question": question, "context": "\n".join(
-            [c.text if hasattr(c, "text") else str(c) for c in relevant_chunks]
-        )}
+        {"question": question, "doc_id": result["doc_id"], "top_k": top_k}
     ))
     return answer
 
@@ -124,6 +70,8 @@ def main():
         if choice == "1":
             pdf_path = prompt_for_pdf()
             print("Loading and processing PDF...")
+            if pipeline:
+                pipeline.close()
             pipeline = DocumentProcessingPipeline(pdf_path)
             print("PDF loaded!")
         elif choice == "2":
@@ -146,6 +94,7 @@ def main():
                     break
                 if user_input.lower() == "clear":
                     print("Reloading document...")
+                    pipeline.close()
                     pipeline = DocumentProcessingPipeline(pdf_path)
                     print("Document reloaded.")
                     continue
@@ -166,6 +115,8 @@ def main():
             summary = pipeline.get_summary()
             print(f"\nSummary:\n{summary}")
         elif choice == "5":
+            if pipeline:
+                pipeline.close()
             print("Goodbye!")
             break
         else:
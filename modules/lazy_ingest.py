@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from modules.mcp_client import call_mcp_tool, run_async
+from server.page_index import rank_pages, format_pages
+
+PROCESSING_SERVER = "server/pdf_processing_server.py"
+
+class LazyIngest:
+    """
+    Ingests a document in the background so questions can be answered before all pages are stored.
+    1. index_pages builds a cheap page index (text layer, titles, outline, keywords) and looks the file
+       up in the document catalog; this is the only step the constructor waits for. A document the
+       catalog already holds in full is not ingested again.
+       doc_id defaults to the catalog's content-hash ID.
+    2. A worker thread ingests pages in batches of batch_pages with ingest_pages, in page order,
+       numbering chunks from the running chunk count (one worker, so the numbering never overlaps).
+    3. prioritize(question) moves the pending pages that best match a question to the front of the
+       queue; wait_for blocks until they are stored, so the answer can use them.
+    A failed batch is retried up to LAZY_INGEST_RETRIES times (default 3) with exponential backoff.
+    After that the worker stops and error is set; the next prioritize or wait_for starts it again.
+    """
+    def __init__(
+        self,
+        pdf_path: str,
+        doc_id: Optional[str] = None,
+        chunk_size: int = 500,
+        batch_pages: int = 4,
+        options: Optional[dict] = None
+    ):
+        self.pdf_path = pdf_path
+        self.chunk_size = chunk_size
+        self.batch_pages = max(1, batch_pages)
+        self.options = options or {}
+        self.index = self._call("index_pages", {
+            "pdf_path": pdf_path,
+            "text_backend": self.options.get("text_backend"),
+            "chunk_size": chunk_size,
+            "ocr_lang": self.options.get("ocr_lang")
+        })
+        self.doc_id = doc_id or self.index["doc_id"]
+        self.page_count = self.index["page_count"]
+        self.chunk_count = 0
+        self.error: Optional[str] = None  # Set when a batch failed after all retries
+        self.retries = 0
+        self.max_retries = int(os.getenv("LAZY_INGEST_RETRIES", "3"))
+        self.started = time.perf_counter()
+        self.finished_s: Optional[float] = None
+        self._queue: List[int] = [entry["page"] for entry in self.index["pages"]]
+        self._done = set()
+        if self.index["ingested"] and self.doc_id == self.index["doc_id"]:
+            self._done.update(self._queue)
+            self._queue = []
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._start_worker()
+
+    def _start_worker(self):
+        self._thread = threading.Thread(target=self._run, name=f"lazy-ingest-{self.doc_id}", daemon=True)
+        self._thread.start()
+
+    def _restart_if_failed(self):
+        """Called with the condition held: restarts a worker that gave up on a batch."""
+        if self.error is not None and not self._stopped and self._queue and not self._thread.is_alive():
+            self.error = None
+            self._start_worker()
+
+    def _call(self, tool_name: str, arguments: dict) -> dict:
+        result = json.loads(run_async(call_mcp_tool(PROCESSING_SERVER, tool_name, arguments))[0].text)
+        if "error" in result:
+            raise ValueError(f"{tool_name} failed for {self.pdf_path}: {result['error']}")
+        return result
+
+    def _run(self):
+        attempts = 0
+        while True:
+            with self._cond:
+                if self._stopped or not self._queue:
+                    break
+                batch = self._queue[:self.batch_pages]
+                del self._queue[:len(batch)]
+                options = {
+                    **self.options,
+                    "doc_id": self.doc_id,
+                    "chunk_size": self.chunk_size,
+                    "start_index": self.chunk_count,
+                    "reset": not self._done,  # The first batch replaces any earlier version of the document
+                    "plan": self.index["plan"],  # Scanned/OCR language detected once by index_pages
+                }
+            try:
+                result = self._call("ingest_pages", {"pdf_path": self.pdf_path, "pages": batch, "options": options})
+            except Exception as e:
+                attempts += 1
+                with self._cond:
+                    self._queue[:0] = batch
+                    if attempts > self.max_retries:
+                        self.error = str(e)
+                        self._cond.notify_all()
+                        return
+                    self.retries += 1
+                    # Backoff of 1, 2, 4... seconds; stop() wakes the worker early
+                    self._cond.wait(min(30.0, 2.0 ** (attempts - 1)))
+                continue
+            attempts = 0
+            with self._cond:
+                self._done.update(batch)
+                self.chunk_count += result["chunk_count"]
+                self._cond.notify_all()
+        with self._cond:
+            if not self._queue:
+                self.finished_s = time.perf_counter() - self.started
+            self._cond.notify_all()
+
+    def prioritize(self, question: str, limit: int = 8) -> List[int]:
+        """Moves up to limit pending pages matching the question to the front of the queue; returns them."""
+        with self._cond:
+            self._restart_if_failed()
+            pages = rank_pages(self.index, question, exclude=self._done, limit=None)
+            pages = [page for page in pages if page in self._queue][:limit]
+            self._queue = pages + [page for page in self._queue if page not in pages]
+            return pages
+
+    def wait_for(self, pages: Iterable[int], timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the given pages (and at least one batch) are stored, ingest fails or timeout expires.
+        Returns True if all of them are stored.
+        """
+        wanted = set(pages)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._restart_if_failed()
+            while not (self._done and wanted <= self._done) and self.error is None and not self._stopped:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                if not self._thread.is_alive() and not self._queue:
+                    break
+                self._cond.wait(remaining)
+            if not self._done and self.error:
+                raise ValueError(self.error)
+            return wanted <= self._done
+
+    @property
+    def complete(self) -> bool:
+        with self._cond:
+            return len(self._done) == self.page_count
+
+    def covered_pages(self) -> List[int]:
+        """Pages stored so far (1-based, sorted)."""
+        with self._cond:
+            return sorted(self._done)
+
+    def coverage_note(self, pages: Optional[Iterable[int]] = None) -> str:
+        """
+        One line stating which pages an answer could draw on (and why the rest are missing).
+        Pass the covered_pages() taken before the answer was requested: the worker keeps ingesting meanwhile.
+        """
+        with self._cond:
+            pages = sorted(self._done if pages is None else set(pages))
+            error = self.error
+        if len(pages) == self.page_count:
+            return f"[Pages searched: all {self.page_count}]"
+        searched = format_pages(pages) or "none"
+        if error:
+            return f"[Pages searched: {searched} of {self.page_count}; ingesting the rest failed: {error}]"
+        return f"[Pages searched: {searched} of {self.page_count}; the rest are still being ingested]"
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "page_count": self.page_count,
+                "pages_done": len(self._done),
+                "pages_queued": len(self._queue),
+                "chunk_count": self.chunk_count,
+                "error": self.error,
+                "retries": self.retries,
+                "finished_s": self.finished_s,
+            }
+
+    def stop(self, wait: bool = True) -> None:
+        """Stops after the batch in progress; pages not yet ingested stay unavailable."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if wait and self._thread is not threading.current_thread():
+            self._thread.join()
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from contextlib import asynccontextmanager
+from mcp.client.stdio import stdio_client, StdioServerParameters
+from mcp.client.session import ClientSession
+from mcp import types
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def server_parameters(server_script: str) -> StdioServerParameters:
+    """
+    Stdio launch parameters for one of the server scripts (path relative to the project root).
+    The server inherits the caller's environment, with the project root on PYTHONPATH
+    so that `server.*` imports resolve regardless of the working directory.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(PROJECT_ROOT), env.get("PYTHONPATH")) if p)
+    return StdioServerParameters(command=sys.executable, args=[str(PROJECT_ROOT / server_script)], env=env)
+
+def server_url(server_script: str):
+    """
+    URL of an already running (warm) instance of the server, if one is configured.
+    The variable is named after the script, e.g. PDF_PROCESSING_SERVER_URL=http://127.0.0.1:5002/mcp
+    for server/pdf_processing_server.py started with --transport streamable-http --warm.
+    """
+    return os.getenv(f"{Path(server_script).stem.upper()}_URL")
+
+@asynccontextmanager
+async def open_session(server_script: str):
+    """
+    Opens an initialized session to the server: over HTTP if a warm instance is configured,
+    otherwise by spawning the script over stdio.
+    """
+    url = server_url(server_script)
+    if url:
+        from mcp.client.streamable_http import streamablehttp_client
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+    else:
+        async with stdio_client(server_parameters(server_script)) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+async def call_tool(session: ClientSession, tool_name: str, arguments: dict, meta: dict = None, progress_callback=None) -> types.CallToolResult:
+    """
+    Sends tools/call with `_meta` (ClientSession.call_tool cannot set it).
+    Unlike call_tool, this does not validate structured output against the tool's output schema,
+    which costs an extra tools/list round trip on every new session.
+    progress_callback(progress, total, message) is awaited for each progress notification the tool sends.
+    """
+    return await session.send_request(
+        types.ClientRequest(
+            types.CallToolRequest(
+                method="tools/call",
+                params=types.CallToolRequestParams(
+                    name=tool_name,
+                    arguments=arguments,
+                    _meta=types.RequestParams.Meta(**(meta or {})),
+                ),
+            )
+        ),
+        types.CallToolResult,
+        progress_callback=progress_callback,
+    )
+
+async def call_mcp_tool(server_script, tool_name, arguments, progress_callback=None):
+    """
+    Calls one tool on the server and returns the result content list.
+    Progress notifications (e.g. answers streamed by answer_questions) go to progress_callback.
+    The current trace context is sent in the request `_meta`, so the server's spans join the
+    caller's trace: `mcp.connect` (spawn/handshake) and `mcp.request` (round trip) here, and
+    `mcp.inbound` (transport and queueing) and `tool <name>` (server time) in the server.
+    """
+    from opentelemetry import trace
+    from server.tracing import get_tracer, inject_trace_context
+    tracer = get_tracer("mcp_client")
+    with tracer.start_as_current_span(f"mcp.call {tool_name}") as span:
+        span.set_attribute("mcp.server", server_script)
+        span.set_attribute("mcp.tool", tool_name)
+        connect = tracer.start_span("mcp.connect")
+        async with open_session(server_script) as session:
+            connect.end()
+            with tracer.start_as_current_span("mcp.request"):
+                result = await call_tool(session, tool_name, arguments, inject_trace_context(), progress_callback)
+            if result.isError:
+                span.set_status(trace.Status(trace.StatusCode.ERROR))
+            return result.content
+
+def run_async(coro):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop and loop.is_running():
+        import nest_asyncio
+        nest_asyncio.apply()
+        return loop.run_until_complete(coro)
+    else:
+        return asyncio.run(coro)
@@ -1,141 +1,128 @@
 import os
-import re
-from mcp.client.stdio import stdio_client, StdioServerParameters
-from mcp.client.session import ClientSession
-import ast
+import json
+import time
+import weakref
+from typing import Callable, List, Optional
 from opentelemetry import trace
+from modules.mcp_client import call_mcp_tool, run_async
+from modules.lazy_ingest import LazyIngest
 
 tracer = trace.get_tracer(__name__)
 
+def _release_resources(lazy_ingest, text_handle):
+    """
+    Stops a lazy ingest and gives back the text_handle reference; runs once, from close() or when the
+    pipeline is collected (possibly inside GC or at exit), so it stays in-process: no MCP call, no event loop.
+    """
+    if lazy_ingest:
+        lazy_ingest.stop(wait=False)
+    if text_handle:
+        from server.artifact_store import get_artifact_store
+        try:
+            get_artifact_store().release(text_handle)
+        except Exception:
+            pass  # The handle then expires with the artifact store's TTL cleanup
+
 class DocumentProcessingPipeline:
-    def __init__(self, pdf_path: str, chunk_size: int = 300, chunk_overlap: int = 150):
+    def __init__(self, pdf_path: str, chunk_size: int = 300, chunk_overlap: int = 150, lazy: bool = None):
         self.pdf_path = pdf_path
         self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-        self.doc_id = self._sanitize_doc_id(pdf_path)
+        self.chunk_overlap = chunk_overlap  # not supported by the server-side chunker; kept for callers
+        # Lazy ingest returns after a cheap page index and stores pages in the background (LAZY_INGEST=1)
+        self.lazy = lazy if lazy is not None else os.getenv("LAZY_INGEST", "0").lower() in ("1", "true")
+        self.lazy_ingest = None
+        self.doc_id = None
         self.text = None
-        self.chunks = None
-        self.embeddings = None
+        self.text_handle = None
+        self.ingest_result = None
         self._process_document()
-
-    def _sanitize_doc_id(self, pdf_path):
-        base = os.path.basename(pdf_path)
-        doc_id = os.path.splitext(base)[0]
-        doc_id = re.sub(r'[^a-zA-Z0-9._-]', '_', doc_id)
-        return doc_id
+        # Callers that drop the pipeline without close() (e.g. evicted from Streamlit's cache) still release it
+        self._finalizer = weakref.finalize(self, _release_resources, self.lazy_ingest, self.text_handle)
 
     async def _call_mcp_tool(self, server_script, tool_name, arguments):
-        server_params = StdioServerParameters(command="python", args=[server_script])
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.call_tool(tool_name, arguments=arguments)
-                return result.content
+        return await call_mcp_tool(server_script, tool_name, arguments)
 
     def run_async(self, coro):
-        import asyncio
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            loop = None
-        if loop and loop.is_running():
-            import nest_asyncio
-            nest_asyncio.apply()
-            return loop.run_until_complete(coro)
-        else:
-            return asyncio.run(coro)
+        return run_async(coro)
 
-    def _process_document(self):
-        with tracer.start_as_current_span("Extract PDF") as span:
+    def _load_text(self):
+        """Extracts the full text on demand; ingest keeps it inside the processing server."""
+        if self.text is None and self.text_handle:
+            from server.artifact_store import get_artifact_store
+            try:
+                self.text = get_artifact_store().get_text(self.text_handle)
+            except KeyError:
+                pass
+        if self.text is None:
             self.text = self.run_async(self._call_mcp_tool(
-                "server/pdf_extractor.py", "extract_pdf_contents", {"pdf_path": self.pdf_path}
+                "server/pdf_processing_server.py", "extract_pdf_contents", {"pdf_path": self.pdf_path}
+            ))[0].text
+        return self.text
+
+    def _process_document(self):
+        if self.lazy:
+            with tracer.start_as_current_span("Index PDF") as span:
+                self.lazy_ingest = LazyIngest(self.pdf_path, chunk_size=self.chunk_size)
+                self.doc_id = self.lazy_ingest.doc_id
+                span.set_attribute("doc_id", self.doc_id)
+                span.set_attribute("pdf_path", self.pdf_path)
+                span.set_attribute("page_count", self.lazy_ingest.page_count)
+            return
+        with tracer.start_as_current_span("Ingest PDF") as span:
+            result = self.run_async(self._call_mcp_tool(
+                "server/pdf_processing_server.py", "ingest_pdf",
+                {"pdf_path": self.pdf_path, "options": {"chunk_size": self.chunk_size}}
             ))[0]
-            if hasattr(self.text, "text"):
-                self.text = self.text.text
+            self.ingest_result = json.loads(result.text)
+            if "error" in self.ingest_result:
+                raise ValueError(f"Failed to ingest {self.pdf_path}: {self.ingest_result['error']}")
+            self.doc_id = self.ingest_result["doc_id"]
+            self.text_handle = self.ingest_result.get("text_handle")
             span.set_attribute("doc_id", self.doc_id)
             span.set_attribute("pdf_path", self.pdf_path)
-            span.set_attribute("text_preview", str(self.text)[:200])
-        print(f"[DEBUG] Extracted text type: {type(self.text)}, value: {str(self.text)[:200]}")
-        with tracer.start_as_current_span("Chunk PDF") as span:
-            self.chunks = self.run_async(self._call_mcp_tool(
-                "server/chunker.py", "chunk_text", {"text": self.text, "chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
-            ))
-            span.set_attribute("num_chunks", len(self.chunks))
-            span.set_attribute("first_chunk", self.chunks[0] if self.chunks else "NO CHUNKS")
-        print(f"[DEBUG] Number of chunks: {len(self.chunks)}")
-        print(f"[DEBUG] First chunk: {self.chunks[0] if self.chunks else 'NO CHUNKS'}")
-        print(f"[DEBUG] All chunks: {self.chunks}")
-        with tracer.start_as_current_span("Embed Chunks and Store") as span:
-            # Convert all chunks to plain strings
-            plain_chunks = [
-                chunk.text if hasattr(chunk, "text") else
-                chunk["text"] if isinstance(chunk, dict) and "text" in chunk else
-                str(chunk)
-                for chunk in self.chunks
-            ]
-            embed_result = self.run_async(self._call_mcp_tool(
-                "server/pdf_processing_server.py", "embed_chunks", {"text_chunks": plain_chunks, "doc_id": self.doc_id}
-            ))
-            span.set_attribute("embed_result", str(embed_result))
-        print(f"[DEBUG] Embed and store result: {embed_result}")
+            span.set_attribute("num_chunks", self.ingest_result["chunk_count"])
+            span.set_attribute("cached", self.ingest_result["cached"])
+            span.set_attribute("page_count", self.ingest_result["page_count"])
+            for stage, ms in self.ingest_result["timings_ms"].items():
+                span.set_attribute(f"{stage}_ms", ms)
+
+    def close(self):
+        """Stops a lazy ingest in progress and releases the reference to the document text held in the artifact store."""
+        if self.lazy_ingest:
+            self.lazy_ingest.stop()
+        self._finalizer()
+        self.text_handle = None
 
     def get_summary(self) -> str:
-        text = self.text
-        if isinstance(text, dict) and "text" in text:
-            text = text["text"]
-        elif isinstance(text, list):
-            if all(isinstance(t, dict) and "text" in t for t in text):
-                text = [t["text"] for t in text]
+        # Send the artifact handle rather than the text when ingest stored it
+        arguments = {"text_handle": self.text_handle} if self.text_handle else {"text": self._load_text()}
         with tracer.start_as_current_span("Summarize PDF") as span:
             summary = self.run_async(self._call_mcp_tool(
-                "server/summarizer.py", "summarize_text", {"text": text}
+                "server/summarizer_qna_server.py", "summarize_text", arguments
             ))[0]
+            if hasattr(summary, "text"):
+                summary = summary.text
             span.set_attribute("summary_preview", str(summary)[:200])
         return summary
 
     def ask_question(self, question: str, top_k: int = 15, fallback_to_llm: bool = True) -> str:
         with tracer.start_as_current_span("QnA") as span:
-            q_embedding_obj = self.run_async(self._call_mcp_tool(
-                "server/embedder.py", "embed_chunks", {"text_chunks": [question]}
-            ))[0]
-            print("[DEBUG] Embedder output:", q_embedding_obj)
-            if hasattr(q_embedding_obj, 'embedding'):
-                q_embedding = q_embedding_obj.embedding
-            elif hasattr(q_embedding_obj, 'text'):
-                try:
-                    q_embedding = ast.literal_eval(q_embedding_obj.text)
-                except Exception:
-                    raise ValueError(f"Could not parse embedding from text: {q_embedding_obj.text}")
-            elif isinstance(q_embedding_obj, dict) and 'embedding' in q_embedding_obj:
-                q_embedding = q_embedding_obj['embedding']
-            elif isinstance(q_embedding_obj, list) and all(isinstance(x, float) for x in q_embedding_obj):
-                q_embedding = q_embedding_obj
-            else:
-                raise ValueError(f"Unexpected embedder output: {q_embedding_obj}")
-            relevant_chunks = self.run_async(self._call_mcp_tool(
-                "server/vector_store.py", "search_embeddings", {
-                    "doc_id": self.doc_id,
-                    "query_embedding": q_embedding,
-                    "top_k": top_k
-                }
-            ))
-            relevant_chunks = [
-                chunk.text if hasattr(chunk, "text") else chunk
-                for chunk in relevant_chunks
-            ]
-            context = "\n".join(relevant_chunks)
-            print("[QNA DEBUG] Context passed to LLM:\n", context)
-            print(f"[QNA DEBUG] Question: {question}")
-            print(f"[QNA DEBUG] Top-K: {top_k}")
-            print(f"[QNA DEBUG] Chunks used for context: {relevant_chunks}")
             span.set_attribute("question", question)
             span.set_attribute("doc_id", self.doc_id)
-            span.set_attribute("context_preview", context[:200])
+            print(f"[QNA DEBUG] Question: {question}")
+            print(f"[QNA DEBUG] Top-K: {top_k}")
+            if self.lazy_ingest:
+                # Pull the pages that look relevant to the front of the ingest queue and wait for them
+                pages = self.lazy_ingest.prioritize(question)
+                self.lazy_ingest.wait_for(pages, timeout=float(os.getenv("LAZY_INGEST_WAIT_S", "60")))
+                covered = self.lazy_ingest.covered_pages()  # What retrieval can see, before ingest moves on
+                span.set_attribute("prioritized_pages", str(pages))
+                span.set_attribute("pages_covered", len(covered))
             answer = self.run_async(self._call_mcp_tool(
-                "server/qna.py", "answer_question", {
-                    "doc_id": self.doc_id,
+                "server/summarizer_qna_server.py", "answer_question", {
                     "question": question,
-                    "context": context
+                    "doc_id": self.doc_id,
+                    "top_k": top_k
                 }
             ))[0]
             if hasattr(answer, 'text'):
@@ -147,13 +134,70 @@ class DocumentProcessingPipeline:
                 from langchain_openai import ChatOpenAI
                 api_key = os.getenv("OPENAI_API_KEY")
                 llm = ChatOpenAI(model="gpt-4-turbo-preview", api_key=api_key)
-                prompt = f"Based on the following document, answer the question as specifically as possible.\n\nDocument:\n{self.text}\n\nQuestion: {question}\n\nAnswer:"
+                prompt = f"Based on the following document, answer the question as specifically as possible.\n\nDocument:\n{self._load_text()}\n\nQuestion: {question}\n\nAnswer:"
                 fallback_answer = llm.invoke(prompt)
                 if hasattr(fallback_answer, "content"):
                     fallback_answer = fallback_answer.content
                 span.set_attribute("fallback_used", True)
                 span.set_attribute("fallback_answer_preview", str(fallback_answer)[:200])
+                if self.lazy_ingest:
+                    # The fallback reads the whole extracted text
+                    all_pages = range(1, self.lazy_ingest.page_count + 1)
+                    fallback_answer = f"{fallback_answer}\n\n{self.lazy_ingest.coverage_note(all_pages)}"
                 return fallback_answer
             span.set_attribute("fallback_used", False)
             span.set_attribute("answer_preview", str(answer)[:200])
-        return answer 
\ No newline at end of file
+            if self.lazy_ingest:
+                answer = f"{answer}\n\n{self.lazy_ingest.coverage_note(covered)}"
+        return answer 
+
+    def answer_questions(
+        self,
+        questions: List[str],
+        top_k: int = 5,
+        max_concurrency: Optional[int] = None,
+        group_shared_context: bool = False,
+        on_result: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        """
+        Answers a questionnaire in one answer_questions call (batched embedding and retrieval,
+        concurrent LLM calls). on_result is called with each answer entry as soon as the server
+        streams it. Returns the tool's result, including per-stage and end-to-end timings
+        (timings_ms); round_trip_ms adds the client side.
+        """
+        with tracer.start_as_current_span("QnA bulk") as span:
+            span.set_attribute("doc_id", self.doc_id)
+            span.set_attribute("questions", len(questions))
+            started = time.perf_counter()
+            if self.lazy_ingest:
+                # Pages matching any of the questions go first; wait once for all of them
+                pages = []
+                for question in questions:
+                    pages += [page for page in self.lazy_ingest.prioritize(question, limit=4) if page not in pages]
+                self.lazy_ingest.wait_for(pages, timeout=float(os.getenv("LAZY_INGEST_WAIT_S", "60")))
+                covered = self.lazy_ingest.covered_pages()  # What retrieval can see, before ingest moves on
+                span.set_attribute("prioritized_pages", str(pages))
+
+            async def progress(done, total, message):
+                if on_result and message:
+                    on_result(json.loads(message))
+
+            content = self.run_async(call_mcp_tool(
+                "server/summarizer_qna_server.py", "answer_questions", {
+                    "doc_id": self.doc_id,
+                    "questions": questions,
+                    "top_k": top_k,
+                    "max_concurrency": max_concurrency,
+                    "group_shared_context": group_shared_context
+                },
+                progress_callback=progress
+            ))
+            if content and not content[0].text.lstrip().startswith("{"):
+                raise ValueError(f"answer_questions failed for {self.doc_id}: {content[0].text}")
+            result = json.loads(content[0].text)
+            result["round_trip_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            if self.lazy_ingest:
+                result["coverage_note"] = self.lazy_ingest.coverage_note(covered)
+            span.set_attribute("llm_calls", result.get("llm_calls", 0))
+            span.set_attribute("round_trip_ms", result["round_trip_ms"])
+        return result
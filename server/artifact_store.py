@@ -0,0 +1,208 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: reference counts are updated without a cross-process lock
+    fcntl = None
+
+HANDLE_PATTERN = re.compile(r"^sha256:([0-9a-f]{64})$")
+
+class ArtifactStore:
+    """
+    Content-addressed store for large intermediate results (document text, chunk lists) shared
+    between MCP server processes on the same machine. A stage writes its output once and passes
+    a handle ('sha256:<hex>') in tool arguments instead of the data; readers map the file with
+    mmap rather than receiving a copy over the transport.
+    - Writing the same content again returns the same handle and does not rewrite the file.
+    - Each put adds a reference for the caller, which it gives back with release(). Artifacts with
+      no references are deleted by cleanup() once they have not been read for ttl_seconds.
+    The directory is shared through ARTIFACT_DIR (default 'artifacts'); ARTIFACT_TTL_SECONDS sets the TTL.
+    """
+    def __init__(self, root: Optional[str] = None, ttl_seconds: Optional[float] = None):
+        self.root = Path(root or os.getenv("ARTIFACT_DIR", "artifacts"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("ARTIFACT_TTL_SECONDS", "3600"))
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+
+    def _paths(self, handle: str):
+        match = HANDLE_PATTERN.match(handle or "")
+        if not match:
+            raise ValueError(f"Invalid artifact handle: {handle!r}")
+        digest = match.group(1)
+        directory = self.root / digest[:2]
+        return directory / f"{digest}.bin", directory / f"{digest}.refs"
+
+    @contextmanager
+    def _locked_refs(self, refs_path: Path):
+        """Opens the reference count file under an exclusive lock shared by all processes."""
+        refs_path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            refs = open(refs_path, "a+")
+            if fcntl:
+                fcntl.flock(refs, fcntl.LOCK_EX)
+            try:
+                if os.fstat(refs.fileno()).st_ino == os.stat(refs_path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            refs.close()  # cleanup() removed the file while we waited for the lock
+        with refs:
+            try:
+                refs.seek(0)
+                yield refs
+            finally:
+                if fcntl:
+                    fcntl.flock(refs, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _update_count(refs, delta: int) -> int:
+        count = max(0, int(refs.read().strip() or 0) + delta)
+        refs.seek(0)
+        refs.truncate()
+        refs.write(str(count))
+        return count
+
+    @contextmanager
+    def writer(self):
+        """
+        Streams an artifact to disk in parts (e.g. one page window at a time).
+        Yields a `write(bytes)` callable; `handle` is set on the yielded object once the block exits.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        tmp = tempfile.NamedTemporaryFile(dir=self.root, delete=False, suffix=".tmp")
+
+        class _Writer:
+            handle = None
+            def write(self, data: bytes):
+                digest.update(data)
+                tmp.write(data)
+
+        result = _Writer()
+        try:
+            yield result
+            tmp.close()
+            result.handle = f"sha256:{digest.hexdigest()}"
+            data_path, refs_path = self._paths(result.handle)
+            # Publishing and counting happen under the lock cleanup() takes, so a concurrent
+            # cleanup cannot delete the file between the two
+            with self._locked_refs(refs_path) as refs:
+                if data_path.exists():
+                    os.unlink(tmp.name)  # Same content is already stored
+                    os.utime(data_path)
+                else:
+                    os.replace(tmp.name, data_path)
+                self._update_count(refs, 1)
+        except BaseException:
+            tmp.close()
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+        self.maybe_cleanup()
+
+    def put_bytes(self, data: bytes) -> str:
+        """Stores bytes and returns their handle, with one reference owned by the caller."""
+        with self.writer() as out:
+            out.write(data)
+        return out.handle
+
+    def put_text(self, text: str) -> str:
+        return self.put_bytes(text.encode("utf-8"))
+
+    def put_json(self, value: Any) -> str:
+        return self.put_bytes(json.dumps(value).encode("utf-8"))
+
+    @contextmanager
+    def open(self, handle: str):
+        """Maps an artifact read-only and yields a memoryview of its bytes (valid inside the block)."""
+        data_path, _ = self._paths(handle)
+        try:
+            file = open(data_path, "rb")
+        except FileNotFoundError:
+            raise KeyError(f"Artifact not found (expired or released): {handle}")
+        with file:
+            os.utime(data_path)  # mtime is the last-access time used for the TTL
+            if os.fstat(file.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def get_text(self, handle: str) -> str:
+        with self.open(handle) as view:
+            return str(view, "utf-8")
+
+    def get_json(self, handle: str) -> Any:
+        with self.open(handle) as view:
+            return json.loads(view.tobytes())
+
+    def retain(self, handle: str) -> int:
+        """Adds a reference to an existing artifact; returns the new count."""
+        data_path, refs_path = self._paths(handle)
+        with self._locked_refs(refs_path) as refs:
+            if not data_path.exists():
+                raise KeyError(f"Artifact not found (expired or released): {handle}")
+            return self._update_count(refs, 1)
+
+    def release(self, handle: str) -> int:
+        """Gives back a reference; returns the remaining count. Unreferenced artifacts expire after the TTL."""
+        _, refs_path = self._paths(handle)
+        with self._locked_refs(refs_path) as refs:
+            return self._update_count(refs, -1)
+
+    def cleanup(self) -> int:
+        """Deletes unreferenced artifacts not read for ttl_seconds; returns how many were removed."""
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for data_path in self.root.glob("*/*.bin"):
+            handle = f"sha256:{data_path.stem}"
+            _, refs_path = self._paths(handle)
+            with self._locked_refs(refs_path) as refs:
+                if int(refs.read().strip() or 0) > 0:
+                    continue
+                try:
+                    if data_path.stat().st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                data_path.unlink(missing_ok=True)
+                refs_path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def maybe_cleanup(self, interval: float = 60.0) -> None:
+        """Runs cleanup at most once per interval in this process."""
+        with self._lock:
+            if time.monotonic() - self._last_cleanup < interval:
+                return
+            self._last_cleanup = time.monotonic()
+        self.cleanup()
+
+    def stats(self) -> dict:
+        sizes = [p.stat().st_size for p in self.root.glob("*/*.bin")]
+        return {"root": str(self.root), "artifacts": len(sizes), "bytes": sum(sizes), "ttl_seconds": self.ttl_seconds}
+
+_shared_artifacts = None
+_shared_artifacts_lock = threading.Lock()
+
+def get_artifact_store() -> ArtifactStore:
+    """Returns the process-wide ArtifactStore."""
+    global _shared_artifacts
+    if _shared_artifacts is None:
+        with _shared_artifacts_lock:
+            if _shared_artifacts is None:
+                _shared_artifacts = ArtifactStore()
+    return _shared_artifacts
@@ -0,0 +1,160 @@
+import os
+from typing import List, Optional, Tuple
+
+from server.model_scheduler import estimate_tokens
+
+def group_by_shared_chunks(chunk_ids: List[List[str]], threshold: float = 0.5, max_group_size: int = 5) -> List[List[int]]:
+    """
+    Groups queries whose retrieved chunks overlap, so they can share one context and one LLM call.
+    Each query joins the first group whose first member's chunk IDs have Jaccard similarity >= threshold
+    with its own, while the group has fewer than max_group_size members; otherwise it starts a new group.
+    Args:
+        chunk_ids: IDs of the chunks retrieved for each query
+        threshold: Minimum Jaccard similarity to the group's first query
+        max_group_size: Maximum number of queries per group
+    Returns:
+        Groups of query indices, in order of their first member
+    """
+    groups = []
+    for i, ids in enumerate(chunk_ids):
+        ids = set(ids)
+        for group in groups:
+            first = set(chunk_ids[group[0]])
+            union = ids | first
+            if len(group) < max_group_size and union and len(ids & first) / len(union) >= threshold:
+                group.append(i)
+                break
+        else:
+            groups.append([i])
+    return groups
+
+class ContextBuilder:
+    """
+    Turns retrieved chunks into the context of a QnA prompt:
+    1. Drops exact duplicates, near-duplicates whose stored embeddings have cosine similarity
+       >= CONTEXT_DUPLICATE_THRESHOLD (default 0.95), and chunks of at least
+       CONTEXT_MIN_CONTAINED_CHARS (default 200) contained in another chunk. Shorter chunks (e.g. a
+       page's tail) are distinct text however often it appears elsewhere, and are kept.
+    2. Orders the rest by maximal marginal relevance (MMR): lambda * similarity to the question
+       - (1 - lambda) * similarity to chunks already chosen (CONTEXT_MMR_LAMBDA, default 0.7).
+    3. Takes chunks in that order while they fit CONTEXT_TOKEN_BUDGET (default 1500 tokens) and
+       at most max_chunks of them.
+    4. Merges chunks that are adjacent in the document (consecutive chunk_index on the same page)
+       and orders passages by position in the document.
+    """
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        mmr_lambda: Optional[float] = None,
+        duplicate_threshold: Optional[float] = None,
+        min_contained_chars: Optional[int] = None
+    ):
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+        self.mmr_lambda = mmr_lambda if mmr_lambda is not None else float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+        self.duplicate_threshold = duplicate_threshold or float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.95"))
+        self.min_contained_chars = min_contained_chars if min_contained_chars is not None else int(os.getenv("CONTEXT_MIN_CONTAINED_CHARS", "200"))
+
+    @staticmethod
+    def _position(chunk: dict) -> Tuple[int, int]:
+        metadata = chunk.get("metadata") or {}
+        return metadata.get("page", 0), metadata.get("chunk_index", 0)
+
+    def _contained(self, text: str, other: str) -> bool:
+        return text == other or (len(text) >= self.min_contained_chars and text in other)
+
+    def _deduplicate(self, chunks: List[dict], similarity) -> List[int]:
+        """Indices of the chunks to keep, in retrieval order."""
+        kept = []
+        for i, chunk in enumerate(chunks):
+            text = chunk["text"].strip()
+            duplicate = False
+            for j in kept:
+                other = chunks[j]["text"].strip()
+                if self._contained(text, other) or (similarity is not None and similarity[i, j] >= self.duplicate_threshold):
+                    duplicate = True
+                    break
+            if not duplicate and text:
+                # A later, longer chunk replaces the earlier ones it contains
+                kept = [j for j in kept if not self._contained(chunks[j]["text"].strip(), text)]
+                kept.append(i)
+        return kept
+
+    def _mmr_order(self, candidates: List[int], relevance, similarity) -> List[int]:
+        if relevance is None:
+            return candidates
+        order = []
+        remaining = list(candidates)
+        while remaining:
+            def score(i):
+                redundancy = max((similarity[i, j] for j in order), default=0.0)
+                return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+            best = max(remaining, key=score)
+            order.append(best)
+            remaining.remove(best)
+        return order
+
+    def _merge(self, chunks: List[dict]) -> List[str]:
+        """Joins runs of adjacent chunks (document order) into passages."""
+        passages = []
+        previous = None
+        for chunk in sorted(chunks, key=self._position):
+            page, index = self._position(chunk)
+            text = chunk["text"]
+            if previous is not None and previous == (page, index - 1):
+                # Chunks are consecutive, non-overlapping slices of the text: joined as they are
+                passages[-1] += text
+            else:
+                passages.append(text)
+            previous = (page, index)
+        return [passage.strip() for passage in passages]
+
+    def build(self, query_embedding: Optional[List[float]], chunks: List[dict], max_chunks: Optional[int] = None) -> Tuple[str, dict]:
+        """
+        Args:
+            query_embedding: Embedding of the question (None skips the similarity-based steps)
+            chunks: Retrieved chunks, best first: {"text", "metadata", "embedding"} (see VectorStore.query_chunks)
+            max_chunks: Upper bound on the chunks used (e.g. the caller's top_k)
+        Returns:
+            (context, stats) where stats holds chunk counts, tokens_in (the first max_chunks chunks
+            joined with newlines, the context sent before), tokens_out and tokens_saved (tokens_in - tokens_out,
+            negative when the built context is larger).
+        """
+        relevance = similarity = None
+        if query_embedding is not None and chunks and all(c.get("embedding") is not None for c in chunks):
+            import numpy as np
+            vectors = np.asarray([c["embedding"] for c in chunks], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+            relevance = vectors @ query
+            similarity = vectors @ vectors.T
+
+        kept = self._deduplicate(chunks, similarity)
+        selected, tokens = [], 0
+        for i in self._mmr_order(kept, relevance, similarity):
+            if max_chunks is not None and len(selected) >= max_chunks:
+                break
+            chunk = chunks[i]
+            chunk_tokens = estimate_tokens(chunk["text"])
+            if tokens + chunk_tokens > self.token_budget:
+                if selected:
+                    continue  # A smaller chunk further down may still fit
+                chunk = {**chunk, "text": chunk["text"][:self.token_budget * 4]}  # The best chunk alone is over budget
+                chunk_tokens = self.token_budget
+            selected.append(chunk)
+            tokens += chunk_tokens
+        passages = self._merge(selected)
+        context = "\n\n".join(passages)
+
+        naive = chunks[:max_chunks] if max_chunks is not None else chunks
+        tokens_in = estimate_tokens("\n".join(c["text"] for c in naive)) if naive else 0
+        tokens_out = estimate_tokens(context) if context else 0
+        return context, {
+            "chunks_retrieved": len(chunks),
+            "duplicates_removed": len(chunks) - len(kept),
+            "chunks_used": len(selected),
+            "passages": len(passages),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+        }
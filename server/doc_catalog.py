@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    source_path TEXT,
+    status TEXT NOT NULL,
+    page_count INTEGER,
+    pages_ingested INTEGER NOT NULL DEFAULT 0,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    char_count INTEGER,
+    settings TEXT NOT NULL,
+    embedding_model TEXT,
+    text_handle TEXT,
+    ingested_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    query_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash);
+CREATE INDEX IF NOT EXISTS documents_ingested_at ON documents (ingested_at);
+CREATE INDEX IF NOT EXISTS documents_source_path ON documents (source_path);
+"""
+
+# Status of a document's chunks in the vector store
+STATUS_PARTIAL = "partial"    # Some pages stored (lazy ingest in progress or interrupted)
+STATUS_COMPLETE = "complete"  # Every selected page stored
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def settings_key(settings: dict) -> str:
+    return json.dumps(settings, sort_keys=True)
+
+def doc_id_for(content_hash: str, settings: dict, embedding_model: str) -> str:
+    """
+    Vector-store document ID of one version of a file: its content hash with the extraction/chunking
+    settings and embedding model. The same file always gets the same ID, whatever its name, and
+    versions with different settings are stored side by side.
+    """
+    key = f"{content_hash}\n{settings_key(settings)}\n{embedding_model}"
+    return f"doc_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]}"
+
+class DocumentCatalog:
+    """
+    SQLite catalog of ingested documents beside the vector store (DOC_CATALOG_PATH, default
+    <VECTOR_DB_DIR>_catalog.sqlite3), one row per doc_id.
+    Records the SHA-256 of the PDF bytes, page and chunk counts, extraction settings, embedding model
+    and ingest time, so repeated uploads of a file (under any name) with the same settings are found
+    with one indexed lookup instead of re-ingesting or enumerating vector store collections.
+    WAL mode lets the servers' processes read while one of them writes.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("DOC_CATALOG_PATH") or f"{os.getenv('VECTOR_DB_DIR', 'vector_db').rstrip('/')}_catalog.sqlite3")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row["name"]: row for row in self._conn.execute("PRAGMA table_info(documents)")}
+            if columns and "query_count" not in columns:  # Catalogs created before query tracking
+                self._conn.execute("ALTER TABLE documents ADD COLUMN query_count INTEGER NOT NULL DEFAULT 0")
+            if columns and columns["content_hash"]["pk"]:
+                # Catalogs keyed by content hash alone: re-key by doc_id, keeping the rows and their doc_ids.
+                # Their text handles are dropped: those entries never owned a reference.
+                self._conn.executescript("ALTER TABLE documents RENAME TO documents_by_hash;" + SCHEMA + """
+                    INSERT INTO documents SELECT doc_id, content_hash, source_path, status, page_count, pages_ingested,
+                        chunk_count, char_count, settings, embedding_model, NULL, ingested_at, last_used_at,
+                        query_count FROM documents_by_hash;
+                    DROP TABLE documents_by_hash;""")
+            self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[dict]:
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["settings"] = json.loads(entry["settings"])
+        return entry
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def lookup(self, content_hash: str, settings: dict, embedding_model: str) -> Optional[dict]:
+        """The most recent catalog entry of a file ingested with these settings and embedding model, or None."""
+        return self._row(self._execute(
+            """SELECT * FROM documents WHERE content_hash = ? AND settings = ? AND embedding_model = ?
+               ORDER BY status = 'complete' DESC, ingested_at DESC LIMIT 1""",
+            (content_hash, settings_key(settings), embedding_model)
+        ).fetchone())
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        """The catalog entry of a doc_id, or None."""
+        return self._row(self._execute("SELECT * FROM documents WHERE doc_id = ?", (doc_id,)).fetchone())
+
+    def start(self, doc_id: str, content_hash: str, source_path: str, settings: dict, embedding_model: str, page_count: Optional[int] = None) -> None:
+        """
+        Records that (re-)ingest of a document began; counts restart from zero.
+        Callers drop the collection and text_handle of an entry they overwrite first.
+        """
+        now = time.time()
+        self._execute(
+            """INSERT INTO documents (doc_id, content_hash, source_path, status, page_count, settings,
+                                      embedding_model, ingested_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (doc_id) DO UPDATE SET
+                   content_hash = excluded.content_hash, source_path = excluded.source_path, status = excluded.status,
+                   page_count = excluded.page_count, pages_ingested = 0, chunk_count = 0, char_count = NULL,
+                   settings = excluded.settings, embedding_model = excluded.embedding_model, text_handle = NULL,
+                   ingested_at = excluded.ingested_at, last_used_at = excluded.last_used_at""",
+            (doc_id, content_hash, source_path, STATUS_PARTIAL, page_count, settings_key(settings), embedding_model, now, now)
+        )
+
+    def add_pages(self, doc_id: str, pages: int, chunks: int) -> dict:
+        """Counts pages and chunks stored by one part of an ingest; the entry is complete once every page is in."""
+        self._execute(
+            """UPDATE documents SET pages_ingested = pages_ingested + ?, chunk_count = chunk_count + ?,
+                   status = CASE WHEN page_count IS NOT NULL AND pages_ingested + ? >= page_count THEN ? ELSE status END
+               WHERE doc_id = ?""",
+            (pages, chunks, pages, STATUS_COMPLETE, doc_id)
+        )
+        return self.get(doc_id)
+
+    def complete(self, doc_id: str, page_count: int, chunk_count: int, char_count: Optional[int] = None, text_handle: Optional[str] = None) -> None:
+        """Records a finished ingest. The entry owns one reference to text_handle (see ingest_pdf)."""
+        self._execute(
+            """UPDATE documents SET status = ?, page_count = ?, pages_ingested = ?, chunk_count = ?, char_count = ?, text_handle = ?
+               WHERE doc_id = ?""",
+            (STATUS_COMPLETE, page_count, page_count, chunk_count, char_count, text_handle, doc_id)
+        )
+
+    def touch(self, doc_id: str) -> None:
+        self._execute("UPDATE documents SET last_used_at = ? WHERE doc_id = ?", (time.time(), doc_id))
+
+    def record_query(self, doc_id: str, count: int = 1) -> None:
+        """Counts questions asked against the document (see hot_documents)."""
+        self._execute("UPDATE documents SET query_count = query_count + ?, last_used_at = ? WHERE doc_id = ?", (count, time.time(), doc_id))
+
+    def hot_documents(self, limit: int = 4, half_life_days: float = 1.0) -> List[str]:
+        """
+        doc_ids of complete documents that were queried, most valuable to keep loaded first:
+        the query count divided by 1 + (time since last use / half_life_days), i.e. halved after one half-life.
+        """
+        rows = self._execute(
+            """SELECT doc_id FROM documents WHERE status = ? AND query_count > 0
+               ORDER BY query_count / (1.0 + MAX(0, ? - last_used_at) / (? * 86400.0)) DESC LIMIT ?""",
+            (STATUS_COMPLETE, time.time(), half_life_days, limit)
+        ).fetchall()
+        return [row["doc_id"] for row in rows]
+
+    def delete(self, doc_id: str) -> None:
+        self._execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def list_documents(self, limit: int = 100, offset: int = 0) -> List[dict]:
+        """Catalog entries, most recently ingested first."""
+        rows = self._execute("SELECT * FROM documents ORDER BY ingested_at DESC LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def stats(self) -> dict:
+        row = self._execute("SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM documents").fetchone()
+        return {"path": str(self.path), "documents": row[0], "chunks": row[1]}
+
+_shared_catalog = None
+_shared_catalog_lock = threading.Lock()
+
+def get_catalog() -> DocumentCatalog:
+    """Returns the process-wide DocumentCatalog, opening it on first use."""
+    global _shared_catalog
+    if _shared_catalog is None:
+        with _shared_catalog_lock:
+            if _shared_catalog is None:
+                _shared_catalog = DocumentCatalog()
+    return _shared_catalog
@@ -0,0 +1,131 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+# (x0, y0, x1, y1, word) in PDF points, origin at the top left of the page
+Word = Tuple[float, float, float, float, str]
+
+class TextDocument(ABC):
+    """An open PDF as seen by a text-extraction backend. Use as a context manager."""
+    page_count: int
+
+    @abstractmethod
+    def page_text(self, index: int) -> str:
+        """Text of one page (0-based index)."""
+
+    @abstractmethod
+    def page_words(self, index: int) -> List[Word]:
+        """Words of one page (0-based index) with their boxes, in reading order."""
+
+    def outline(self) -> List[Tuple[int, str, int]]:
+        """Bookmarks as (level, title, 1-based page) tuples; empty if the PDF has none."""
+        return []
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PyPDF2Document(TextDocument):
+    """Pure-Python extraction with PyPDF2 (the original behaviour)."""
+    def __init__(self, pdf_path: str):
+        from PyPDF2 import PdfReader
+        self.reader = PdfReader(pdf_path)
+        self.page_count = len(self.reader.pages)
+
+    def page_text(self, index: int) -> str:
+        return self.reader.pages[index].extract_text() or ""
+
+    def page_words(self, index: int) -> List[Word]:
+        """
+        Words placed by the page's text operators. PyPDF2 reports where each text run starts but not
+        glyph widths, so boxes are estimated: each character is taken as half the font size wide.
+        """
+        page = self.reader.pages[index]
+        height = float(page.mediabox.height)
+        words: List[Word] = []
+
+        def visit(text, cm, tm, font, font_size):
+            # Text space -> user space; the run starts at the text matrix origin
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            size = (font_size or 10.0) * (abs(tm[3] * cm[3]) or 1.0)
+            offset = 0
+            for line in text.split("\n"):
+                for word in line.split(" "):
+                    if word.strip():
+                        x0 = x + offset * size / 2
+                        words.append((x0, height - y - size, x0 + len(word) * size / 2, height - y, word.strip()))
+                    offset += len(word) + 1
+                offset = 0
+                y -= size
+
+        page.extract_text(visitor_text=visit)
+        return sorted(words, key=lambda w: (round(w[1]), w[0]))
+
+    def outline(self) -> List[Tuple[int, str, int]]:
+        entries = []
+        def walk(items, level):
+            for item in items:
+                if isinstance(item, list):  # Children of the preceding entry
+                    walk(item, level + 1)
+                else:
+                    entries.append((level, item.title, self.reader.get_destination_page_number(item) + 1))
+        walk(self.reader.outline, 1)
+        return entries
+
+class PyMuPDFDocument(TextDocument):
+    """
+    Extraction with PyMuPDF (MuPDF, C). mode selects how page text is assembled:
+    - text:   MuPDF's plain text output
+    - blocks: text blocks in reading order (top to bottom, left to right), one per paragraph
+    - words:  words with positions, rebuilt into lines; page_words returns the positions
+    """
+    def __init__(self, pdf_path: str, mode: str = "text"):
+        import fitz
+        self.doc = fitz.open(pdf_path)
+        self.page_count = self.doc.page_count
+        self.mode = mode
+
+    def page_text(self, index: int) -> str:
+        page = self.doc.load_page(index)
+        if self.mode == "blocks":
+            blocks = [b for b in page.get_text("blocks", sort=True) if b[6] == 0]  # type 0 = text, 1 = image
+            return "\n".join(b[4].strip() for b in blocks)
+        if self.mode == "words":
+            lines: Dict[Tuple[int, int], List[str]] = {}
+            for *_, word, block_no, line_no, _ in page.get_text("words", sort=True):
+                lines.setdefault((block_no, line_no), []).append(word)
+            return "\n".join(" ".join(words) for words in lines.values())
+        return page.get_text("text")
+
+    def page_words(self, index: int) -> List[Word]:
+        return [tuple(w[:5]) for w in self.doc.load_page(index).get_text("words", sort=True)]
+
+    def outline(self) -> List[Tuple[int, str, int]]:
+        return [(level, title, page) for level, title, page, *_ in self.doc.get_toc()]
+
+    def close(self) -> None:
+        self.doc.close()
+
+BACKENDS = {
+    "pypdf2": PyPDF2Document,
+    "pymupdf": lambda path: PyMuPDFDocument(path, "text"),
+    "pymupdf-blocks": lambda path: PyMuPDFDocument(path, "blocks"),
+    "pymupdf-words": lambda path: PyMuPDFDocument(path, "words"),
+}
+
+def default_backend() -> str:
+    """Backend used when none is requested: PDF_TEXT_BACKEND, else PyMuPDF."""
+    return os.getenv("PDF_TEXT_BACKEND", "pymupdf")
+
+def open_document(pdf_path: str, backend: Optional[str] = None) -> TextDocument:
+    """Opens a PDF with the named text backend (see BACKENDS)."""
+    name = (backend or default_backend()).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown text backend {name!r}; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](pdf_path)
@@ -0,0 +1,180 @@
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+ENV_PATH = Path(__file__).parent.parent / '.env'
+
+# Base URL of the bundled stand-in (server/openai_standin.py) used by LLM_PROVIDER=local
+LOCAL_BASE_URL = "http://127.0.0.1:8808/v1"
+FAKE_COMPLETION = "This is a deterministic offline completion."
+
+@lru_cache(maxsize=1)
+def _dotenv() -> dict:
+    """The project's .env file, read once per process."""
+    values = {}
+    if ENV_PATH.exists():
+        with open(ENV_PATH) as f:
+            for line in f:
+                name, sep, value = line.strip().partition('=')
+                if sep and name not in values:
+                    values[name] = value
+    return values
+
+def get_setting(name: str, default=None):
+    """Reads a setting from the environment, falling back to the project's .env file."""
+    value = os.getenv(name)
+    if value is not None:
+        return value
+    return _dotenv().get(name, default)
+
+def get_api_key():
+    """Get OpenAI API key from the environment or .env file"""
+    return get_setting("OPENAI_API_KEY")
+
+# Provider selection:
+#   openai - OpenAI, or any OpenAI-compatible endpoint set via OPENAI_BASE_URL (default)
+#   local  - the bundled stand-in server at LOCAL_BASE_URL (see server/openai_standin.py)
+#   fake   - in-process deterministic stand-ins, no network at all
+LLM_PROVIDER = get_setting("LLM_PROVIDER", "openai")
+CHAT_MODEL = get_setting("LLM_MODEL", "gpt-4-turbo-preview")
+EMBEDDING_MODEL = get_setting("EMBEDDING_MODEL", "text-embedding-ada-002")
+FAKE_EMBEDDING_DIM = int(get_setting("FAKE_EMBEDDING_DIM", "1536"))
+
+# Connection pool shared by every model client in the process (keep-alive, one TLS handshake per connection)
+POOL_MAX_CONNECTIONS = int(get_setting("LLM_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(get_setting("LLM_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(get_setting("LLM_POOL_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(get_setting("LLM_TIMEOUT", "60"))
+CONNECT_TIMEOUT = float(get_setting("LLM_CONNECT_TIMEOUT", "10"))
+# Retries are done by server/model_scheduler.py, which also adapts concurrency to 429s
+CLIENT_MAX_RETRIES = int(get_setting("LLM_CLIENT_MAX_RETRIES", "0"))
+
+_clients = {}
+_clients_lock = threading.RLock()  # factories register the shared HTTP clients they use
+_pool_stats = {"requests": 0, "clients_created": 0}
+
+def _count_request(request):
+    _pool_stats["requests"] += 1
+
+async def _count_request_async(request):
+    _pool_stats["requests"] += 1
+
+def _registered(key, factory):
+    """Returns the process-wide client for key, creating it on first use."""
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+                _pool_stats["clients_created"] += 1
+    return client
+
+def _http_options() -> dict:
+    import httpx
+    return {
+        "limits": httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+    }
+
+def get_http_client():
+    """Shared keep-alive httpx.Client used by all synchronous model calls in this process."""
+    import httpx
+    return _registered("http", lambda: httpx.Client(**_http_options(), event_hooks={"request": [_count_request]}))
+
+def get_async_http_client():
+    """Shared keep-alive httpx.AsyncClient used by all asynchronous model calls in this process."""
+    import httpx
+    return _registered("http_async", lambda: httpx.AsyncClient(**_http_options(), event_hooks={"request": [_count_request_async]}))
+
+def _pool_connections(client) -> dict:
+    # httpx does not expose its pool; the httpcore pool behind the default transport does
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    return {
+        "open": len(connections),
+        "idle": sum(1 for c in connections if c.is_idle()),
+        "active": sum(1 for c in connections if not c.is_idle() and not c.is_closed()),
+    }
+
+def client_stats() -> dict:
+    """Connection-pool and client-registry statistics for this process."""
+    stats = {
+        "provider": LLM_PROVIDER,
+        "clients": sorted(str(key) for key in _clients),
+        "clients_created": _pool_stats["clients_created"],
+        "requests": _pool_stats["requests"],
+        "limits": {
+            "max_connections": POOL_MAX_CONNECTIONS,
+            "max_keepalive": POOL_MAX_KEEPALIVE,
+            "keepalive_expiry_s": POOL_KEEPALIVE_EXPIRY,
+            "timeout_s": REQUEST_TIMEOUT,
+            "connect_timeout_s": CONNECT_TIMEOUT,
+        },
+    }
+    for key in ("http", "http_async"):
+        if key in _clients:
+            stats[f"{key}_pool"] = _pool_connections(_clients[key])
+    return stats
+
+def _openai_connection() -> dict:
+    """Returns the api_key/base_url keyword arguments for the OpenAI clients."""
+    if LLM_PROVIDER == "local":
+        return {
+            "api_key": get_api_key() or "local",
+            "base_url": get_setting("OPENAI_BASE_URL", LOCAL_BASE_URL),
+        }
+    api_key = get_api_key()
+    if not api_key:
+        raise ValueError("Could not find OPENAI_API_KEY in .env file")
+    return {"api_key": api_key, "base_url": get_setting("OPENAI_BASE_URL")}
+
+def _create_embeddings():
+    if LLM_PROVIDER == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=FAKE_EMBEDDING_DIM)
+    from langchain_openai import OpenAIEmbeddings
+    connection = _openai_connection()
+    # Compatible servers expect raw strings; only api.openai.com gets pre-tokenized input
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        check_embedding_ctx_length=connection["base_url"] is None,
+        max_retries=CLIENT_MAX_RETRIES,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **connection
+    )
+
+def _create_chat_model(model: str):
+    if LLM_PROVIDER == "fake":
+        from langchain_core.language_models import FakeListChatModel
+        return FakeListChatModel(responses=[FAKE_COMPLETION])
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        max_retries=CLIENT_MAX_RETRIES,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **_openai_connection()
+    )
+
+def get_embeddings():
+    """
+    Returns the process-wide embeddings client for the configured provider.
+    It is created once and shared by concurrent tool calls; requests go through the shared connection pool.
+    With LLM_PROVIDER=fake, embeddings are derived from a hash of the text (no network, no key).
+    """
+    return _registered(("embeddings", EMBEDDING_MODEL), _create_embeddings)
+
+def get_chat_model(model: str = CHAT_MODEL):
+    """
+    Returns the process-wide chat model for the configured provider and model name.
+    It is created once and shared by concurrent tool calls; requests go through the shared connection pool.
+    With LLM_PROVIDER=fake, every call returns the same canned completion.
+    """
+    return _registered(("chat", model), lambda: _create_chat_model(model))
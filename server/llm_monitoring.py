@@ -1,26 +1,132 @@
+import atexit
 import json
 import logging
+import os
+import queue
+import random
+import threading
 import time
 import uuid
+from logging.handlers import QueueHandler
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+LOG_FILE = "logs/llm_monitor.log"
+BATCH_SIZE = int(os.getenv("LLM_MONITOR_BATCH_SIZE", "100"))
+FLUSH_INTERVAL = float(os.getenv("LLM_MONITOR_FLUSH_INTERVAL", "1.0"))
+SAMPLE_RATE = float(os.getenv("LLM_MONITOR_SAMPLE_RATE", "1.0"))
+
+_writer = None
+_writer_lock = threading.Lock()
+
+class _JSONPayload:
+    """
+    Defers json.dumps until the record is formatted on the writer thread.
+    The metadata dict is copied on creation, so callers may reuse or change theirs afterwards.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = dict(data, metadata=dict(data.get("metadata") or {}))
+
+    def __str__(self) -> str:
+        return json.dumps(self.data)
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that enqueues records unformatted so callers only pay for a queue put."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class _BatchWriter(threading.Thread):
+    """
+    Background thread that drains the monitor queue and appends records to the log file
+    in batches of up to batch_size, flushing at least every flush_interval seconds.
+    A record that fails to format is reported on stderr (logging.Handler.handleError) and skipped;
+    a failed write drops that batch only, and the thread keeps draining the queue.
+    """
+    def __init__(self, log_queue: queue.Queue, filename: str, batch_size: int, flush_interval: float):
+        super().__init__(name="llm-monitor-writer", daemon=True)
+        self.queue = log_queue
+        self.filename = filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Used for formatting and error reporting only; the thread does the writing
+        self.handler = logging.Handler()
+        self.handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        self._stop_marker = object()
+
+    def run(self):
+        with open(self.filename, "a", encoding="utf-8") as stream:
+            while True:
+                try:
+                    batch = [self.queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = any(r is self._stop_marker for r in batch)
+                lines = [line for line in map(self._format, batch) if line is not None]
+                if lines:
+                    try:
+                        stream.write("".join(lines))
+                        stream.flush()
+                    except Exception:
+                        self.handler.handleError(batch[0])
+                if stopping:
+                    return
+
+    def _format(self, record) -> Optional[str]:
+        if record is self._stop_marker:
+            return None
+        try:
+            return self.handler.format(record) + "\n"
+        except Exception:
+            self.handler.handleError(record)
+            return None
+
+    def stop(self):
+        self.queue.put(self._stop_marker)
+        self.join(timeout=5)
+
+def _get_writer() -> _BatchWriter:
+    """Starts the process-wide writer and attaches its queue handler to the llm_monitor logger once."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            Path(LOG_FILE).parent.mkdir(exist_ok=True)
+            log_queue = queue.SimpleQueue()
+            _writer = _BatchWriter(log_queue, LOG_FILE, BATCH_SIZE, FLUSH_INTERVAL)
+            _writer.start()
+            logger = logging.getLogger("llm_monitor")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = _DeferredQueueHandler(log_queue)
+            handler.setLevel(logging.INFO)
+            logger.addHandler(handler)
+            atexit.register(_writer.stop)
+        return _writer
+
 class LLMMonitor:
-    def __init__(self):
-        """Initialize the LLM monitoring client with basic logging."""
-        log_dir = Path("logs")
-        log_dir.mkdir(exist_ok=True)
-        
-        # Set up logging
+    def __init__(self, sample_rate: Optional[float] = None):
+        """
+        Initialize the LLM monitoring client.
+        Records are written asynchronously by a single process-wide writer thread.
+        Args:
+            sample_rate: Fraction of per-call records to keep (default: LLM_MONITOR_SAMPLE_RATE or 1.0).
+                Aggregate batch records are always kept.
+        """
+        _get_writer()
         self.logger = logging.getLogger("llm_monitor")
-        self.logger.setLevel(logging.INFO)
-        
-        # File handler
-        fh = logging.FileHandler("logs/llm_monitor.log")
-        fh.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        fh.setFormatter(formatter)
-        self.logger.addHandler(fh)
+        self.sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+
+    def _sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def _emit(self, label: str, log_data: Dict[str, Any]):
+        self.logger.info("%s: %s", label, _JSONPayload(log_data))
 
     def log_embedding(self, text: str, embedding: List[float], metadata: Optional[Dict[str, Any]] = None):
         """
@@ -30,6 +136,8 @@ class LLMMonitor:
             embedding: The resulting embedding vector
             metadata: Optional metadata about the embedding operation
         """
+        if not self._sampled():
+            return
         log_data = {
             "type": "embedding",
             "trace_id": str(uuid.uuid4()),
@@ -38,7 +146,37 @@ class LLMMonitor:
             "embedding_dim": len(embedding),
             "metadata": metadata or {}
         }
-        self.logger.info(f"Embedding operation: {json.dumps(log_data)}")
+        self._emit("Embedding operation", log_data)
+
+    def log_embedding_batch(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadata: Optional[Dict[str, Any]] = None,
+        latency_ms: Optional[float] = None
+    ):
+        """
+        Log one aggregate record for a batch of embeddings (e.g. all chunks of a document).
+        Args:
+            texts: The input texts that were embedded
+            embeddings: The resulting embedding vectors
+            metadata: Optional metadata about the embedding operation
+            latency_ms: Optional latency of the whole batch in milliseconds
+        """
+        lengths = [len(t) for t in texts]
+        log_data = {
+            "type": "embedding_batch",
+            "trace_id": str(uuid.uuid4()),
+            "timestamp": int(time.time() * 1000),
+            "count": len(texts),
+            "total_text_length": sum(lengths),
+            "min_text_length": min(lengths, default=0),
+            "max_text_length": max(lengths, default=0),
+            "embedding_dim": len(embeddings[0]) if embeddings else 0,
+            "latency_ms": latency_ms,
+            "metadata": metadata or {}
+        }
+        self._emit("Embedding batch", log_data)
 
     def log_llm_interaction(
         self,
@@ -57,6 +195,8 @@ class LLMMonitor:
             metadata: Optional metadata about the interaction
             latency_ms: Optional latency in milliseconds
         """
+        if not self._sampled():
+            return
         log_data = {
             "type": "llm_interaction",
             "trace_id": str(uuid.uuid4()),
@@ -67,7 +207,7 @@ class LLMMonitor:
             "latency_ms": latency_ms,
             "metadata": metadata or {}
         }
-        self.logger.info(f"LLM interaction: {json.dumps(log_data)}")
+        self._emit("LLM interaction", log_data)
 
     def log_rag_interaction(
         self,
@@ -84,6 +224,8 @@ class LLMMonitor:
             retrieved_chunks: The chunks retrieved from the vector store
             metadata: Optional metadata about the interaction
         """
+        if not self._sampled():
+            return
         log_data = {
             "type": "rag_interaction",
             "trace_id": str(uuid.uuid4()),
@@ -93,4 +235,4 @@ class LLMMonitor:
             "chunks_count": len(retrieved_chunks),
             "metadata": metadata or {}
         }
-        self.logger.info(f"RAG interaction: {json.dumps(log_data)}") 
\ No newline at end of file
+        self._emit("RAG interaction", log_data)
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# Latency bucket upper bounds in milliseconds (Prometheus-style cumulative histogram)
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+METRIC_PREFIX = "pdf_assistant"
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. observe() is a bisect plus a few integer updates,
+    cheap enough to leave on for every call.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value_ms
+            self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimates the q-quantile by linear interpolation inside the matching bucket.
+        Returns None if nothing has been observed.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return float(self.buckets[-1])
+
+class MetricsRegistry:
+    """
+    In-process registry of per-stage counters and latency histograms.
+    Stages used across the servers: extract, ocr_page, chunk, embed_batch, embed_query, store, retrieve, llm.
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage: str) -> Histogram:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def inc(self, name: str, stage: str, amount: float = 1) -> None:
+        """Increments the counter `name` for a stage (e.g. inc("items", "embed_batch", 64))."""
+        with self._lock:
+            key = (name, stage)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, stage: str, latency_ms: float) -> None:
+        """Records one call of a stage with its latency."""
+        self._histogram(stage).observe(latency_ms)
+
+    @contextmanager
+    def time_stage(self, stage: str, items: Optional[int] = None):
+        """
+        Context manager that records latency of the enclosed block under `stage`.
+        Exceptions are counted as errors and re-raised.
+        Args:
+            stage: Stage name
+            items: Optional number of items processed (pages, chunks, ...)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("errors", stage)
+            raise
+        finally:
+            self.observe(stage, (time.perf_counter() - start) * 1000)
+            if items is not None:
+                self.inc("items", stage, items)
+
+    def snapshot(self) -> dict:
+        """Returns counters and latency summaries (count, mean, p50, p95, p99 in ms) per stage."""
+        stages = {}
+        for stage, histogram in sorted(self._histograms.items()):
+            count = histogram.count
+            stages[stage] = {
+                "count": count,
+                "mean_ms": histogram.sum / count if count else None,
+                "p50_ms": histogram.quantile(0.5),
+                "p95_ms": histogram.quantile(0.95),
+                "p99_ms": histogram.quantile(0.99),
+            }
+        with self._lock:
+            counters = dict(self._counters)
+        for (name, stage), value in sorted(counters.items()):
+            stages.setdefault(stage, {})[name] = value
+        return {"uptime_s": time.time() - self.started_at, "stages": stages}
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        latency = f"{METRIC_PREFIX}_stage_latency_ms"
+        lines = [
+            f"# HELP {latency} Latency of pipeline stages in milliseconds.",
+            f"# TYPE {latency} histogram",
+        ]
+        for stage, histogram in sorted(self._histograms.items()):
+            with histogram._lock:
+                counts = list(histogram.counts)
+                total, total_sum = histogram.count, histogram.sum
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{latency}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{latency}_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'{latency}_sum{{stage="{stage}"}} {total_sum}')
+            lines.append(f'{latency}_count{{stage="{stage}"}} {total}')
+        with self._lock:
+            counters = dict(self._counters)
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{METRIC_PREFIX}_stage_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, stage), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f'{metric}{{stage="{stage}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+time_stage = registry.time_stage
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = registry.render_prometheus().encode()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body = json.dumps(registry.snapshot()).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # stdout/stderr belong to the MCP stdio transport
+        pass
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """
+    Serves /metrics (Prometheus text) and /metrics.json from a daemon thread.
+    Returns None if the port is already taken (e.g. by another server process).
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def start_http_server_from_env(env_var: str) -> Optional[ThreadingHTTPServer]:
+    """Starts the metrics endpoint if the given environment variable holds a port number."""
+    port = os.getenv(env_var)
+    if not port:
+        return None
+    return start_http_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional, TypeVar
+
+from server.metrics import registry as metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets can only be shared within one process
+    fcntl = None
+
+T = TypeVar("T")
+
+# Lower runs first. Interactive calls (QnA, summaries) go ahead of bulk ingest embeddings.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+def estimate_tokens(texts) -> int:
+    """Rough token count (4 characters per token) of a string or list of strings."""
+    if isinstance(texts, str):
+        texts = [texts]
+    return max(1, sum(len(t) for t in texts) // 4)
+
+def classify_error(error: Exception) -> Optional[str]:
+    """'rate_limit' for 429s, 'retryable' for 5xx/timeouts/connection errors, None otherwise."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    name = type(error).__name__
+    if status == 429 or name == "RateLimitError":
+        return "rate_limit"
+    if (isinstance(status, int) and status >= 500) or name in ("APIConnectionError", "APITimeoutError", "InternalServerError"):
+        return "retryable"
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return "retryable"
+    return None
+
+def retry_after_seconds(error: Exception) -> float:
+    """Server-requested delay from a Retry-After header, 0 if there is none."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at per_minute/60 per second, holding at most per_minute.
+    With state_path, the level lives in a file updated under flock so every process using the
+    same path shares one budget. per_minute=0 disables the limit.
+    """
+    def __init__(self, per_minute: float, state_path: Optional[Path] = None):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.state_path = state_path
+        self._level = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            if self.state_path is None or fcntl is None:
+                state = {"level": self._level, "updated": self._updated}
+                yield state
+                self._level, self._updated = state["level"], state["updated"]
+                return
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    parts = f.read().split()
+                    state = {"level": float(parts[0]), "updated": float(parts[1])} if len(parts) == 2 \
+                        else {"level": self.capacity, "updated": time.time()}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(f"{state['level']} {state['updated']}")
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_take(self, amount: float, reserve: float = 0.0) -> float:
+        """
+        Takes amount if that leaves at least reserve * capacity in the bucket.
+        Returns 0 if taken, else the seconds until it would be possible.
+        """
+        if self.capacity <= 0:
+            return 0.0
+        amount = min(amount, self.capacity * (1 - reserve))  # Oversized requests still pass eventually
+        with self._state() as state:
+            now = time.time()
+            state["level"] = min(self.capacity, state["level"] + (now - state["updated"]) * self.rate)
+            state["updated"] = now
+            floor = reserve * self.capacity
+            if state["level"] - amount >= floor:
+                state["level"] -= amount
+                return 0.0
+            return (amount + floor - state["level"]) / self.rate
+
+    def level(self) -> Optional[float]:
+        """Tokens currently available, or None if the bucket is unlimited."""
+        if self.capacity <= 0:
+            return None
+        with self._state() as state:
+            return min(self.capacity, state["level"] + (time.time() - state["updated"]) * self.rate)
+
+class ModelScheduler:
+    """
+    Admission control and retries for upstream model calls (embeddings, chat).
+    - Requests and tokens per minute are limited by token buckets (LLM_RPM, LLM_TPM; 0 = unlimited).
+      Bulk calls may not take the last LLM_INTERACTIVE_RESERVE fraction of either bucket.
+      Set LLM_RATE_STATE_DIR to share the buckets between server processes.
+    - Concurrency adapts AIMD-style between LLM_MIN_CONCURRENCY and LLM_MAX_CONCURRENCY:
+      +1/limit per successful call, halved on a 429 (at most once per second), and reduced
+      by 10% when a call is slower than LLM_LATENCY_TARGET_MS (0 = ignore latency).
+    - Waiting calls are admitted in priority order (see PRIORITY_*), FIFO within a priority.
+    - 429s, 5xx, timeouts and connection errors are retried up to LLM_MAX_RETRIES times with
+      full-jitter exponential backoff (LLM_RETRY_BASE_DELAY .. LLM_RETRY_MAX_DELAY seconds),
+      never sooner than a Retry-After header asks. A 429 also pauses admission for that long.
+    """
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        min_concurrency: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        initial_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        latency_target_ms: Optional[float] = None,
+        interactive_reserve: Optional[float] = None,
+        state_dir: Optional[str] = None
+    ):
+        def setting(value, name, default, cast=float):
+            return cast(value if value is not None else os.getenv(name, default))
+        state_dir = state_dir or os.getenv("LLM_RATE_STATE_DIR")
+        self.requests = TokenBucket(setting(rpm, "LLM_RPM", "0"), Path(state_dir) / "rpm" if state_dir else None)
+        self.tokens = TokenBucket(setting(tpm, "LLM_TPM", "0"), Path(state_dir) / "tpm" if state_dir else None)
+        self.min_concurrency = setting(min_concurrency, "LLM_MIN_CONCURRENCY", "1", int)
+        self.max_concurrency = setting(max_concurrency, "LLM_MAX_CONCURRENCY", "16", int)
+        self.limit = float(setting(initial_concurrency, "LLM_INITIAL_CONCURRENCY", "4", int))
+        self.max_retries = setting(max_retries, "LLM_MAX_RETRIES", "6", int)
+        self.base_delay = setting(base_delay, "LLM_RETRY_BASE_DELAY", "0.5")
+        self.max_delay = setting(max_delay, "LLM_RETRY_MAX_DELAY", "30")
+        self.latency_target_ms = setting(latency_target_ms, "LLM_LATENCY_TARGET_MS", "0")
+        self.interactive_reserve = setting(interactive_reserve, "LLM_INTERACTIVE_RESERVE", "0.2")
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    def _acquire(self, priority: int, tokens: int) -> None:
+        reserve = self.interactive_reserve if priority >= PRIORITY_BULK else 0.0
+        with self._cond:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters[0] == entry and self.in_flight < int(self.limit):
+                        wait = self.paused_until - time.monotonic()
+                        if wait <= 0:
+                            wait = self.requests.try_take(1, reserve)
+                            if wait <= 0:
+                                wait = self.tokens.try_take(tokens, reserve)
+                                if wait > 0:
+                                    self.requests.try_take(-1)  # Give the request slot back
+                        if wait <= 0:
+                            self.in_flight += 1
+                            return
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def _release(self, latency_ms: Optional[float], rate_limited: bool, retry_after: float) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                self.paused_until = max(self.paused_until, now + retry_after)
+                if now - self._last_decrease >= 1.0:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = now
+            elif latency_ms is not None:
+                if self.latency_target_ms and latency_ms > self.latency_target_ms:
+                    if now - self._last_decrease >= 1.0:
+                        self.limit = max(self.min_concurrency, self.limit * 0.9)
+                        self._last_decrease = now
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def run(self, fn: Callable[[], T], priority: int = PRIORITY_INTERACTIVE, tokens: int = 1, stage: str = "llm") -> T:
+        """Runs fn (one upstream call) under the limits, retrying transient failures."""
+        self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            self._acquire(priority, tokens)
+            started = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                kind = classify_error(e)
+                retry_after = retry_after_seconds(e)
+                self._release(None, kind == "rate_limit", retry_after)
+                if kind == "rate_limit":
+                    self.counters["rate_limited"] += 1
+                    metrics.inc("rate_limited", stage)
+                if kind is None or attempt == self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                self.counters["retries"] += 1
+                metrics.inc("retries", stage)
+                backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                time.sleep(max(backoff, retry_after))
+                continue
+            self._release((time.perf_counter() - started) * 1000, False, 0.0)
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.counters,
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "rpm_available": self.requests.level(),
+                "tpm_available": self.tokens.level(),
+            }
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> ModelScheduler:
+    """Returns the process-wide scheduler used for all model calls."""
+    global _shared_scheduler
+    if _shared_scheduler is None:
+        with _shared_scheduler_lock:
+            if _shared_scheduler is None:
+                _shared_scheduler = ModelScheduler()
+    return _shared_scheduler
@@ -0,0 +1,170 @@
+import os
+import threading
+from typing import Optional
+from server.ocr_cache import OCRCache
+from server.metrics import registry as metrics
+
+# Script reported by tesseract OSD -> language pack(s) to OCR the document with
+SCRIPT_LANGUAGES = {
+    "Latin": "eng",
+    "Han": "chi_sim+eng",
+    "HanS": "chi_sim+eng",
+    "HanT": "chi_tra+eng",
+    "Japanese": "jpn+eng",
+    "Hangul": "kor+eng",
+    "Korean": "kor+eng",
+    "Cyrillic": "rus+eng",
+    "Arabic": "ara+eng",
+    "Greek": "ell+eng",
+    "Devanagari": "hin+eng",
+}
+
+class OCREngine:
+    """
+    Renders PDF pages to grayscale pixmaps and OCRs them with tesseract.
+    - DPI is chosen per page from the resolution of the scanned image on it, clamped to [min_dpi, max_dpi].
+    - The pixmap's raw sample buffer is handed to the OCR call; there is no PNG encode/decode round trip.
+      tesserocr is used when installed (in-process C API), pytesseract otherwise. A tesserocr API, which
+      loads the language model once, is kept per thread and language and reused for every page.
+    - lang is a tesseract language string (e.g. 'eng', 'chi_sim+eng') or 'auto' to detect the script once per document.
+    - Page results are cached on disk by rendered-pixel hash (see OCRCache); set OCR_CACHE=0 to disable.
+    """
+    def __init__(
+        self,
+        lang: Optional[str] = None,
+        dpi: Optional[int] = None,
+        min_dpi: int = None,
+        max_dpi: int = None,
+        default_dpi: int = None,
+        max_pixels: int = None,
+        cache: Optional[OCRCache] = None
+    ):
+        self.lang = lang or os.getenv("OCR_LANG", "auto")
+        self.dpi = dpi or (int(os.getenv("OCR_DPI")) if os.getenv("OCR_DPI") else None)  # fixed DPI overrides adaptive
+        self.min_dpi = min_dpi or int(os.getenv("OCR_MIN_DPI", "150"))
+        self.max_dpi = max_dpi or int(os.getenv("OCR_MAX_DPI", "400"))
+        self.default_dpi = default_dpi or int(os.getenv("OCR_DEFAULT_DPI", "300"))
+        self.max_pixels = max_pixels or int(os.getenv("OCR_MAX_PIXELS", str(40_000_000)))
+        self.cache = cache if cache is not None else (OCRCache() if os.getenv("OCR_CACHE", "1") != "0" else None)
+        self._version = None
+        self._apis = threading.local()  # lang -> PyTessBaseAPI, per thread (an API is not thread-safe)
+        try:
+            import tesserocr  # noqa: F401
+            self.backend = "tesserocr"
+        except ImportError:
+            self.backend = "pytesseract"
+
+    def version(self) -> str:
+        """Engine identifier including the tesseract version (used to key cached results)."""
+        if self._version is None:
+            if self.backend == "tesserocr":
+                import tesserocr
+                self._version = f"tesserocr-{tesserocr.tesseract_version().split()[1]}"
+            else:
+                import pytesseract
+                self._version = f"pytesseract-{pytesseract.get_tesseract_version()}"
+        return self._version
+
+    def choose_dpi(self, page) -> int:
+        """
+        Picks the render DPI for a page: the native resolution of the largest image on it
+        (rendering above it adds no information), clamped to [min_dpi, max_dpi] and to max_pixels.
+        """
+        if self.dpi:
+            return self.dpi
+        dpi = self.default_dpi
+        best_area = 0
+        for info in page.get_image_info():
+            x0, y0, x1, y1 = info["bbox"]
+            width_in = (x1 - x0) / 72
+            height_in = (y1 - y0) / 72
+            if width_in <= 0 or height_in <= 0:
+                continue
+            area = width_in * height_in
+            if area > best_area:
+                best_area = area
+                dpi = max(info["width"] / width_in, info["height"] / height_in)
+        dpi = min(max(dpi, self.min_dpi), self.max_dpi)
+        page_pixels = (page.rect.width / 72 * dpi) * (page.rect.height / 72 * dpi)
+        if page_pixels > self.max_pixels:
+            dpi *= (self.max_pixels / page_pixels) ** 0.5
+        return int(dpi)
+
+    def render(self, page, dpi: Optional[int] = None):
+        """Renders a page to a single-channel 8-bit pixmap."""
+        import fitz
+        return page.get_pixmap(dpi=dpi or self.choose_dpi(page), colorspace=fitz.csGRAY, alpha=False)
+
+    def _pil_image(self, pix):
+        """Wraps the pixmap samples in a PIL image without copying or re-encoding them."""
+        from PIL import Image
+        image = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+        # pytesseract writes its temp file in image.format; BMP avoids spending time on PNG compression
+        image.format = "BMP"
+        return image
+
+    def _tesserocr_api(self, lang: str):
+        """This thread's tesserocr API for lang, created (and the model loaded) on first use."""
+        apis = getattr(self._apis, "by_lang", None)
+        if apis is None:
+            apis = self._apis.by_lang = {}
+        if lang not in apis:
+            import tesserocr
+            apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+        return apis[lang]
+
+    def recognize(self, pix, lang: str) -> str:
+        """OCRs a grayscale pixmap."""
+        if self.backend == "tesserocr":
+            api = self._tesserocr_api(lang)
+            try:
+                api.SetImageBytes(pix.samples, pix.width, pix.height, 1, pix.stride)
+                api.SetSourceResolution(pix.xres)
+                return api.GetUTF8Text()
+            finally:
+                api.Clear()  # Frees the page image and results; the loaded model stays
+        from pytesseract import image_to_string
+        return image_to_string(self._pil_image(pix), lang=lang, config=f"--dpi {pix.xres}")
+
+    def ocr_page(self, page, lang: str) -> str:
+        """Renders and OCRs one page, serving repeated pages from the cache."""
+        pix = self.render(page)
+        if self.cache is None:
+            return self.recognize(pix, lang)
+        key = self.cache.key(pix, lang, self.version())
+        text = self.cache.get(key)
+        if text is None:
+            metrics.inc("cache_misses", "ocr_page")
+            text = self.recognize(pix, lang)
+            self.cache.put(key, text)
+        else:
+            metrics.inc("cache_hits", "ocr_page")
+        return text
+
+    def detect_language(self, pix) -> str:
+        """
+        Detects the script of a rendered page with tesseract OSD and maps it to installed language packs.
+        Falls back to 'eng' if OSD is unavailable or the script is not covered.
+        """
+        import pytesseract
+        try:
+            osd = pytesseract.image_to_osd(self._pil_image(pix), output_type=pytesseract.Output.DICT)
+            installed = set(pytesseract.get_languages(config=""))
+        except Exception:
+            return "eng"
+        lang = SCRIPT_LANGUAGES.get(osd.get("script"), "eng")
+        if all(part in installed for part in lang.split("+")):
+            return lang
+        return "eng"
+
+    def resolve_language(self, doc, pages, lang: Optional[str] = None) -> str:
+        """
+        Returns the language string for a document: `lang` if given, else the engine setting,
+        running detection on the document's first page if that is 'auto'.
+        """
+        lang = lang or self.lang
+        if lang != "auto":
+            return lang
+        if not pages:
+            return "eng"
+        return self.detect_language(self.render(doc.load_page(pages[0])))
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+class OCRCache:
+    """
+    On-disk cache of per-page OCR text, keyed by a hash of the rendered page pixels plus the
+    OCR settings (language, DPI, engine version). Repeated pages (cover sheets, signature pages,
+    standard forms) are recognized once, even across otherwise different documents.
+    Entries are plain text files; the least recently used ones are evicted once the cache
+    grows beyond max_bytes.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir or os.getenv("OCR_CACHE_DIR", "ocr_cache"))
+        self.max_bytes = max_bytes or int(os.getenv("OCR_CACHE_MAX_MB", "256")) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # bytes on disk, computed lazily on first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(pix, lang: str, engine_version: str) -> str:
+        """Hash of the pixmap samples and every setting that affects the OCR output."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{pix.width}x{pix.height}:{pix.stride}:{pix.xres}:{lang}:{engine_version}".encode())
+        digest.update(pix.samples_mv)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)  # mtime doubles as the LRU timestamp
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = text.encode("utf-8")
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False, suffix=".tmp") as tmp:
+            tmp.write(data)
+        with self._lock:
+            # Replacing an entry (e.g. the same page OCR'd by two workers) frees the old file's bytes
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp.name, path)
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        return list(self.cache_dir.glob("*/*.txt"))
+
+    def _disk_usage(self) -> int:
+        return sum(p.stat().st_size for p in self._entries())
+
+    def _evict(self) -> None:
+        """Deletes least recently used entries until the cache is at 90% of max_bytes."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+        self._size = size
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "cache_dir": str(self.cache_dir), "max_bytes": self.max_bytes}
@@ -0,0 +1,179 @@
+"""
+Local OpenAI-compatible stand-in for offline load testing.
+
+Serves /v1/embeddings and /v1/chat/completions with deterministic hash-based embeddings
+and canned completions. Latency, token rate, error rate and 429 injection are configurable,
+so concurrency, batching and retry behaviour can be exercised without API spend.
+
+Run it and point the servers at it:
+    python server/openai_standin.py --port 8808 --latency-ms 200 --rate-limit-rate 0.05
+    LLM_PROVIDER=local python agents.py sample.pdf --question "..."
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import os
+import random
+import struct
+import time
+from typing import Any, Dict, List, Union
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+class StandinConfig:
+    """Behaviour knobs; every field can also be set through an OPENAI_STANDIN_<FIELD> environment variable."""
+    def __init__(self, **overrides):
+        def setting(name, default, cast=float):
+            value = overrides.get(name)
+            if value is None:
+                value = os.getenv(f"OPENAI_STANDIN_{name.upper()}", default)
+            return cast(value)
+        self.latency_ms = setting("latency_ms", 50)
+        self.jitter_ms = setting("jitter_ms", 10)
+        self.token_rate = setting("token_rate", 200)  # completion tokens per second, 0 = instant
+        self.completion_tokens = setting("completion_tokens", 64, int)
+        self.embedding_dim = setting("embedding_dim", 1536, int)
+        self.error_rate = setting("error_rate", 0)  # fraction of requests answered with HTTP 500
+        self.rate_limit_rate = setting("rate_limit_rate", 0)  # fraction of requests answered with HTTP 429
+        self.rpm_limit = setting("rpm_limit", 0, int)  # hard requests-per-minute limit, 0 = unlimited
+        self.seed = setting("seed", 0, int)
+
+def hash_embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector derived from blake2b digests of the text."""
+    values = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.blake2b(f"{counter}:{text}".encode(), digest_size=64).digest()
+        values.extend(v / 32768.0 for v in struct.unpack("<32h", digest))
+        counter += 1
+    values = values[:dim]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+def approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def create_app(config: StandinConfig = None) -> FastAPI:
+    config = config or StandinConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="OpenAI stand-in")
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "injected_429": 0, "injected_500": 0, "tokens": 0}
+    window: List[float] = []  # request timestamps within the last minute, for rpm_limit
+
+    def _error(status: int, message: str, kind: str) -> JSONResponse:
+        headers = {"retry-after": "1"} if status == 429 else {}
+        return JSONResponse(status_code=status, headers=headers,
+                            content={"error": {"message": message, "type": kind, "code": kind}})
+
+    def _inject_failure():
+        """Returns an error response for this request, or None if it should succeed."""
+        now = time.monotonic()
+        while window and now - window[0] > 60:
+            window.pop(0)
+        if config.rpm_limit and len(window) >= config.rpm_limit:
+            stats["injected_429"] += 1
+            return _error(429, "Rate limit reached for requests", "rate_limit_exceeded")
+        window.append(now)
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            stats["injected_429"] += 1
+            return _error(429, "Rate limit reached for requests", "rate_limit_exceeded")
+        if roll < config.rate_limit_rate + config.error_rate:
+            stats["injected_500"] += 1
+            return _error(500, "The server had an error while processing your request", "server_error")
+        return None
+
+    async def _simulate_latency(extra_seconds: float = 0.0):
+        jitter = rng.uniform(-config.jitter_ms, config.jitter_ms)
+        await asyncio.sleep(max(0.0, (config.latency_ms + jitter) / 1000 + extra_seconds))
+
+    @app.middleware("http")
+    async def track_concurrency(request: Request, call_next):
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            return await call_next(request)
+        finally:
+            stats["in_flight"] -= 1
+
+    @app.post("/v1/embeddings")
+    async def embeddings(body: Dict[str, Any]):
+        failure = _inject_failure()
+        await _simulate_latency()
+        if failure:
+            return failure
+        inputs: Union[str, List[Any]] = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dim = int(body.get("dimensions") or config.embedding_dim)
+        # Token-array inputs (tiktoken pre-tokenization) are hashed by their repr
+        texts = [item if isinstance(item, str) else repr(item) for item in inputs]
+        prompt_tokens = sum(approx_tokens(t) for t in texts)
+        stats["tokens"] += prompt_tokens
+        return {
+            "object": "list",
+            "model": body.get("model", "standin-embedding"),
+            "data": [{"object": "embedding", "index": i, "embedding": hash_embedding(t, dim)} for i, t in enumerate(texts)],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: Dict[str, Any]):
+        if body.get("stream"):
+            return _error(400, "Streaming is not supported by the stand-in", "invalid_request_error")
+        failure = _inject_failure()
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        prompt_tokens = approx_tokens(prompt)
+        completion_tokens = config.completion_tokens
+        generation_time = completion_tokens / config.token_rate if config.token_rate else 0.0
+        await _simulate_latency(0.0 if failure else generation_time)
+        if failure:
+            return failure
+        stats["tokens"] += prompt_tokens + completion_tokens
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        content = f"Stand-in answer {digest} based on {prompt_tokens} prompt tokens."
+        return {
+            "id": f"chatcmpl-standin-{digest}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "standin-chat"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "standin-chat", "object": "model"},
+                                           {"id": "standin-embedding", "object": "model"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--token-rate", type=float, help="Completion tokens per second (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int)
+    parser.add_argument("--embedding-dim", type=int)
+    parser.add_argument("--error-rate", type=float, help="Fraction of requests failing with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, help="Fraction of requests failing with HTTP 429")
+    parser.add_argument("--rpm-limit", type=int, help="Requests per minute before every request gets HTTP 429")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    import uvicorn
+    overrides = {k: v for k, v in vars(args).items() if k not in ("host", "port")}
+    uvicorn.run(create_app(StandinConfig(**overrides)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import math
+import re
+from collections import Counter
+from typing import Iterable, List, Optional
+
+STOPWORDS = frozenset("""
+a about above after again against all also an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or other
+our out over own page same she should so some such than that the their them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+def terms(text: str) -> List[str]:
+    """Lower-cased words of three or more letters/digits, without stopwords."""
+    return [t for t in re.findall(r"[a-z0-9][a-z0-9_-]{2,}", text.lower()) if t not in STOPWORDS]
+
+def page_title(text: str, max_length: int = 120) -> Optional[str]:
+    """First non-empty line of the page, if it is short enough to be a heading."""
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            return line if len(line) <= max_length else None
+    return None
+
+def build_page_index(doc, keywords_per_page: int = 12) -> dict:
+    """
+    Cheap page-level signals of an open document (see server/extract_backends.py), from its text
+    layer and outline only: no OCR, no embeddings. Pages without a text layer (scanned) have
+    chars == 0 and no keywords.
+    Args:
+        doc: An open TextDocument
+        keywords_per_page: Number of keywords kept per page
+    Returns:
+        {"page_count", "text_pages", "pages": [{"page" (1-based), "chars", "title", "sections", "keywords"}]}
+    """
+    sections = {}
+    for _, title, page in doc.outline():
+        sections.setdefault(page, []).append(title)
+    texts = [doc.page_text(i) for i in range(doc.page_count)]
+    page_terms = [Counter(terms(text)) for text in texts]
+    document_frequency = Counter(term for counts in page_terms for term in counts)
+    n = max(1, doc.page_count)
+    pages = []
+    for i, (text, counts) in enumerate(zip(texts, page_terms)):
+        # tf-idf: words frequent on this page but rare elsewhere describe it best
+        weights = {t: c * (math.log((n + 1) / (document_frequency[t] + 1)) + 1) for t, c in counts.items()}
+        keywords = sorted(weights, key=lambda t: (-weights[t], t))[:keywords_per_page]
+        pages.append({
+            "page": i + 1,
+            "chars": len(text.strip()),
+            "title": page_title(text),
+            "sections": sections.get(i + 1, []),
+            "keywords": keywords,
+        })
+    return {"page_count": doc.page_count, "text_pages": sum(1 for p in pages if p["chars"]), "pages": pages}
+
+def rank_pages(index: dict, question: str, exclude: Iterable[int] = (), limit: Optional[int] = None) -> List[int]:
+    """
+    Pages of a build_page_index result that match the question, best first.
+    Section and title words count most, then keywords (earlier keywords weigh more).
+    Pages in exclude and pages without any match are left out.
+    """
+    wanted = set(terms(question))
+    excluded = set(exclude)
+    scored = []
+    for entry in index["pages"]:
+        if entry["page"] in excluded:
+            continue
+        heading_terms = set(terms(" ".join(entry["sections"] + [entry["title"] or ""])))
+        score = 3.0 * len(wanted & heading_terms)
+        keywords = entry["keywords"]
+        for rank, keyword in enumerate(keywords):
+            if keyword in wanted:
+                score += 2.0 - rank / len(keywords)
+        if score > 0:
+            scored.append((-score, entry["page"]))
+    return [page for _, page in sorted(scored)[:limit]]
+
+def format_pages(pages: Iterable[int]) -> str:
+    """Compact page list, e.g. [1, 2, 3, 7, 9, 10] -> '1-3, 7, 9-10'."""
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
@@ -1,10 +1,10 @@
-from PyPDF2 import PdfReader
-from pytesseract import image_to_string
-from PIL import Image
-import fitz
-import io
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from mcp.server.fastmcp import FastMCP
+from server.metrics import time_stage
+from server.profiling import install as install_profiling
+from server.tracing import instrument as instrument_tracing
+from server.ocr import OCREngine
+from server.extract_backends import open_document
 
 class PDFExtractor:
     """
@@ -13,45 +13,58 @@ class PDFExtractor:
     - pdf_path: Path to the PDF file.
     - pages: Comma-separated string of page numbers (e.g., '1,2,-1').
     Returns extracted text as a string.
+    Text layers are read by a backend from server/extract_backends.py: text_backend here,
+    else PDF_TEXT_BACKEND, else PyMuPDF. Methods taking text_backend override it per document.
     """
-    def __init__(self):
-        pass
+    def __init__(self, ocr_engine: Optional[OCREngine] = None, text_backend: Optional[str] = None):
+        self.ocr_engine = ocr_engine or OCREngine()
+        self.text_backend = text_backend
 
-    def is_scanned_pdf(self, pdf_path: str) -> bool:
+    def open_document(self, pdf_path: str, text_backend: Optional[str] = None):
+        """Opens the PDF with the per-call backend, else the extractor's default."""
+        return open_document(pdf_path, text_backend or self.text_backend)
+
+    def is_scanned_pdf(self, pdf_path: str, text_backend: Optional[str] = None) -> bool:
         """
         Returns True if the PDF is likely scanned (no extractable text), else False.
         """
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            if page.extract_text().strip():
-                return False
+        with self.open_document(pdf_path, text_backend) as doc:
+            for page_num in range(doc.page_count):
+                if doc.page_text(page_num).strip():
+                    return False
         return True
 
-    def extract_text_from_scanned(self, pdf_path: str, pages: List[int]) -> str:
+    def extract_text_from_scanned(self, pdf_path: str, pages: List[int], lang: Optional[str] = None) -> str:
         """
         Extracts text from scanned PDF pages using OCR.
+        lang overrides the engine's language setting ('auto' detects it from the first page).
         """
-        doc = fitz.open(pdf_path)
+        import fitz
+        engine = self.ocr_engine
         extracted_text = []
-        for page_num in pages:
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap()
-            img = Image.open(io.BytesIO(pix.tobytes()))
-            text = image_to_string(img, lang='chi_sim+eng')
-            extracted_text.append(f"Page {page_num + 1}:\n{text}")
+        with fitz.open(pdf_path) as doc:
+            lang = engine.resolve_language(doc, pages, lang)
+            for page_num in pages:
+                with time_stage("ocr_page", items=1):
+                    text = engine.ocr_page(doc.load_page(page_num), lang)
+                extracted_text.append(f"Page {page_num + 1}:\n{text}")
         return "\n\n".join(extracted_text)
 
-    def extract_text_from_normal(self, pdf_path: str, pages: List[int]) -> str:
+    def extract_text_from_normal(self, pdf_path: str, pages: List[int], text_backend: Optional[str] = None) -> str:
         """
         Extracts text from normal (digitally generated) PDF pages.
         """
-        reader = PdfReader(pdf_path)
-        extracted_text = []
-        for page_num in pages:
-            page = reader.pages[page_num]
-            extracted_text.append(f"Page {page_num + 1}:\n{page.extract_text()}")
+        with self.open_document(pdf_path, text_backend) as doc:
+            extracted_text = []
+            for page_num in pages:
+                extracted_text.append(f"Page {page_num + 1}:\n{doc.page_text(page_num)}")
         return "\n\n".join(extracted_text)
 
+    def page_count(self, pdf_path: str, text_backend: Optional[str] = None) -> int:
+        """Returns the number of pages in the PDF."""
+        with self.open_document(pdf_path, text_backend) as doc:
+            return doc.page_count
+
     def parse_pages(self, pages_str: Optional[str], total_pages: int) -> List[int]:
         """
         Parses a comma-separated string of page numbers into a list of indices.
@@ -77,33 +90,90 @@ class PDFExtractor:
                 continue
         return sorted(set(pages))
 
-    def extract_content(self, pdf_path: str, pages: Optional[str]) -> str:
+    def plan_pages(
+        self,
+        pdf_path: str,
+        pages: Optional[str] = None,
+        ocr_lang: Optional[str] = None,
+        text_backend: Optional[str] = None
+    ) -> Tuple[List[int], bool, Optional[str]]:
+        """
+        Prepares a PDF for extraction in page windows (see extract_window).
+        Returns the selected page indices, whether the PDF is scanned and the resolved OCR language.
+        """
+        if not pdf_path:
+            raise ValueError("PDF path cannot be empty")
+        is_scanned = self.is_scanned_pdf(pdf_path, text_backend)
+        selected_pages = self.parse_pages(pages, self.page_count(pdf_path, text_backend))
+        if is_scanned and selected_pages:
+            import fitz
+            # Resolve 'auto' once for the whole document rather than once per window
+            with fitz.open(pdf_path) as doc:
+                ocr_lang = self.ocr_engine.resolve_language(doc, selected_pages, ocr_lang)
+        return selected_pages, is_scanned, ocr_lang
+
+    def extract_window(
+        self,
+        pdf_path: str,
+        pages: List[int],
+        is_scanned: bool,
+        ocr_lang: Optional[str] = None,
+        text_backend: Optional[str] = None
+    ) -> str:
+        """
+        Extracts one window of pages planned by plan_pages.
+        Joining consecutive windows with blank lines gives the same text as extract_content.
+        """
+        with time_stage("extract", items=len(pages)):
+            if is_scanned:
+                return self.extract_text_from_scanned(pdf_path, pages, ocr_lang)
+            return self.extract_text_from_normal(pdf_path, pages, text_backend)
+
+    def extract_content(
+        self,
+        pdf_path: str,
+        pages: Optional[str],
+        ocr_lang: Optional[str] = None,
+        text_backend: Optional[str] = None
+    ) -> str:
         """
         Extracts text from the specified pages of a PDF file.
         Determines if the PDF is scanned or normal and uses the appropriate method.
+        ocr_lang optionally overrides the OCR language for scanned PDFs ('auto' to detect).
+        text_backend optionally overrides the text-layer backend for this document.
         Returns extracted text as a string.
         """
         if not pdf_path:
             raise ValueError("PDF path cannot be empty")
         try:
-            is_scanned = self.is_scanned_pdf(pdf_path)
-            reader = PdfReader(pdf_path)
-            total_pages = len(reader.pages)
-            selected_pages = self.parse_pages(pages, total_pages)
-            if is_scanned:
-                text = self.extract_text_from_scanned(pdf_path, selected_pages)
-            else:
-                text = self.extract_text_from_normal(pdf_path, selected_pages)
+            with time_stage("extract"):
+                is_scanned = self.is_scanned_pdf(pdf_path, text_backend)
+                total_pages = self.page_count(pdf_path, text_backend)
+                selected_pages = self.parse_pages(pages, total_pages)
+                if is_scanned:
+                    text = self.extract_text_from_scanned(pdf_path, selected_pages, ocr_lang)
+                else:
+                    text = self.extract_text_from_normal(pdf_path, selected_pages, text_backend)
             return text
         except Exception as e:
             raise ValueError(f"Failed to extract PDF content: {str(e)}")
 
+def warmup():
+    """Imports the extraction and OCR dependencies ahead of the first call."""
+    import fitz  # noqa: F401
+    import PyPDF2  # noqa: F401
+    import pytesseract  # noqa: F401
+    from PIL import Image  # noqa: F401
+
 mcp = FastMCP("pdf_extractor")
+instrument_tracing(mcp, "pdf_extractor")  # joins the caller's trace, see server/tracing.py
+install_profiling(mcp)  # opt-in per-call profiles, see server/profiling.py
 extractor = PDFExtractor()
 
 @mcp.tool()
-def extract_pdf_contents(pdf_path: str, pages: str = None) -> str:
-    return extractor.extract_content(pdf_path, pages)
+def extract_pdf_contents(pdf_path: str, pages: str = None, ocr_lang: str = None, text_backend: str = None) -> str:
+    return extractor.extract_content(pdf_path, pages, ocr_lang, text_backend)
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    from server.serve import serve
+    serve(mcp, warmup)
\ No newline at end of file
@@ -1,44 +1,62 @@
 from mcp.server.fastmcp import FastMCP
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from contextlib import nullcontext
+import gc
 import json
-from pathlib import Path
-from langchain_openai import OpenAIEmbeddings
+import time
 
 # Import your PDF extractor class
 # You'll need to make sure pdf_extractor.py is in the same directory
 from pdf_extractor import PDFExtractor
-from server.vector_store import VectorStore  # Add this import
+from server.vector_store import get_vector_store
+from server.doc_catalog import get_catalog, file_sha256, doc_id_for
+from server.metrics import registry as metrics, time_stage, start_http_server_from_env
+from server.profiling import install as install_profiling
+from server.tracing import instrument as instrument_tracing
+from server.llm_clients import get_embeddings, client_stats, LLM_PROVIDER, EMBEDDING_MODEL
+from server.model_scheduler import get_scheduler, estimate_tokens, PRIORITY_BULK
+from server.artifact_store import get_artifact_store
+from server.page_index import build_page_index
 
 mcp = FastMCP(
     name="combined_document_processor"
 )
+instrument_tracing(mcp, "pdf_processing_server")  # joins the caller's trace, see server/tracing.py
+install_profiling(mcp)  # opt-in per-call profiles, see server/profiling.py
 
 # Initialize PDF extractor
 extractor = PDFExtractor()
 
-vector_store = VectorStore()  # Instantiate the vector store
-
-def get_api_key():
-    """Get OpenAI API key from .env file"""
-    env_path = Path(__file__).parent.parent / '.env'
-    if env_path.exists():
-        with open(env_path) as f:
-            for line in f:
-                if line.startswith('OPENAI_API_KEY='):
-                    return line.strip().split('=')[1]
-    return None
-
 @mcp.tool()
-def extract_pdf_contents(pdf_path: str, pages: Optional[str] = None) -> str:
+def extract_pdf_contents(
+    pdf_path: str,
+    pages: Optional[str] = None,
+    ocr_lang: Optional[str] = None,
+    text_backend: Optional[str] = None
+) -> str:
     """
     Extracts text from a PDF file.
     Args:
         pdf_path: Path to the PDF file.
         pages: Comma-separated page numbers (optional).
+        ocr_lang: Tesseract language(s) for scanned PDFs, e.g. 'eng' or 'chi_sim+eng' (optional, 'auto' detects).
+        text_backend: Text-layer backend: 'pymupdf', 'pymupdf-blocks', 'pymupdf-words' or 'pypdf2'
+            (optional, default PDF_TEXT_BACKEND or 'pymupdf').
     Returns:
         Extracted text as a string.
     """
-    return extractor.extract_content(pdf_path, pages)
+    return extractor.extract_content(pdf_path, pages, ocr_lang, text_backend)
+
+@mcp.tool()
+def get_pdf_info(pdf_path: str) -> dict:
+    """
+    Returns basic information about a PDF without extracting its text.
+    Args:
+        pdf_path: Path to the PDF file.
+    Returns:
+        Dictionary with the page count.
+    """
+    return {"page_count": extractor.page_count(pdf_path)}
 
 @mcp.tool()
 def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
@@ -50,28 +68,33 @@ def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
     Returns:
         List of text chunks (as strings).
     """
-    return [str(text[i:i+chunk_size]) for i in range(0, len(text), chunk_size)]
+    with time_stage("chunk"):
+        chunks = [str(text[i:i+chunk_size]) for i in range(0, len(text), chunk_size)]
+    metrics.inc("items", "chunk", len(chunks))
+    return chunks
 
 @mcp.tool()
-def embed_chunks(text_chunks: List[str], doc_id: str = None) -> List[str]:
+def embed_chunks(text_chunks: List[str], doc_id: str = None, start_index: int = 0) -> List[str]:
     """
     Generates vector embeddings for a list of text chunks using OpenAI embeddings.
     If doc_id is provided, also stores the embeddings and chunks in the vector DB.
     Args:
         text_chunks: List of text chunks.
         doc_id: Optional document ID for storage.
+        start_index: Index of the first chunk within the document, when storing a document in parts.
     Returns:
         List of embedding vectors as JSON strings (one per chunk), or a confirmation message if stored.
     """
     try:
-        api_key = get_api_key()
-        if not api_key:
-            raise ValueError("Could not find OPENAI_API_KEY in .env file")
-        embedder = OpenAIEmbeddings(api_key=api_key)
-        vectors = embedder.embed_documents(text_chunks)
+        embedder = get_embeddings()
+        with time_stage("embed_batch", items=len(text_chunks)):
+            vectors = get_scheduler().run(
+                lambda: embedder.embed_documents(text_chunks),
+                priority=PRIORITY_BULK, tokens=estimate_tokens(text_chunks), stage="embed_batch"
+            )
         if doc_id:
             # Store in vector DB
-            vector_store.store_document(doc_id, text_chunks, vectors)
+            get_vector_store().store_document(doc_id, text_chunks, vectors, start_index=start_index)
             return [f"Document '{doc_id}' stored with {len(text_chunks)} chunks."]
         return [json.dumps(vec) for vec in vectors]
     except Exception as e:
@@ -107,10 +130,421 @@ def process_pdf_to_embeddings(pdf_path: str, chunk_size: int = 500, pages: Optio
     except Exception as e:
         return {"error": str(e)}
 
+def _process_rss_mb() -> float:
+    import psutil
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+def _embedding_model() -> str:
+    return f"{LLM_PROVIDER}:{EMBEDDING_MODEL}"
+
+def _ingest_settings(mode: str, pages: Optional[str], ocr_lang: Optional[str], text_backend: Optional[str], chunk_size: int) -> dict:
+    """
+    Catalog settings of an ingest. mode is "eager" (ingest_pdf: chunks run across page boundaries)
+    or "lazy" (ingest_pages: each page chunked on its own), since the two produce different chunks.
+    """
+    return {"mode": mode, "pages": pages, "ocr_lang": ocr_lang, "text_backend": text_backend, "chunk_size": int(chunk_size)}
+
+def _check_doc_id(catalog, doc_id: str, content_hash: str) -> None:
+    """Rejects a caller-supplied doc_id that the catalog already holds for a different file."""
+    entry = catalog.get(doc_id)
+    if entry and entry["content_hash"] != content_hash:
+        raise ValueError(f"doc_id {doc_id!r} already holds another document ({entry['source_path']}); use another doc_id")
+
+def _resolve_doc_id(catalog, doc_id: Optional[str], content_hash: str, settings: dict) -> Tuple[str, Optional[dict]]:
+    """
+    The doc_id to ingest under and its catalog entry: the caller's doc_id (if it isn't another file's),
+    else the file's existing version with these settings, else a new ID for this version.
+    """
+    if doc_id:
+        _check_doc_id(catalog, doc_id, content_hash)
+        return doc_id, catalog.get(doc_id)
+    entry = catalog.lookup(content_hash, settings, _embedding_model())
+    return (entry["doc_id"] if entry else doc_id_for(content_hash, settings, _embedding_model())), entry
+
+def _drop_version(store, doc_id: str, entry: Optional[dict]) -> None:
+    """Drops what a catalog entry about to be overwritten holds: its collection and its text_handle reference."""
+    if entry and entry["text_handle"]:
+        get_artifact_store().release(entry["text_handle"])
+    if store.has_document(doc_id):
+        store.delete_document(doc_id)  # Re-ingest replaces the previous version
+
+@mcp.tool()
+def ingest_pdf(pdf_path: str, options: Optional[dict] = None) -> dict:
+    """
+    Complete ingest inside the server: extract -> chunk -> embed -> store, one page window at a time.
+    Only the document ID, counts and timings are returned; no text, chunks or vectors cross the transport.
+    Chunks are identical to chunking the whole extracted text at once.
+    Documents are identified by the SHA-256 of the file, the settings and the embedding model (see
+    server/doc_catalog.py): if the catalog already holds a complete ingest of the same bytes with the
+    same settings and embedding model, nothing is extracted or embedded again and the catalog entry
+    is returned (cached: True). Ingests with other settings are stored side by side.
+    Args:
+        pdf_path: Path to the PDF file (must be readable by the server).
+        options: Optional settings:
+            doc_id: Document ID to store under (default: derived from the content hash and settings).
+            chunk_size: The maximum size of each chunk (default: 500).
+            pages: Comma-separated page numbers (default: all pages).
+            ocr_lang: Tesseract language(s) for scanned PDFs.
+            text_backend: Text-layer backend for this document (see extract_pdf_contents).
+            window_pages: Pages extracted and embedded per step (default: 20).
+            memory_ceiling_mb: Halve the window whenever this server's RSS exceeds it; if the RSS is
+                still above it with one-page windows, the ingest stops with an error (optional).
+            keep_text: Also write the extracted text to the artifact store (default: True).
+            force: Ingest even if the catalog already holds this document (default: False).
+    Returns:
+        Dictionary with doc_id, content_hash, cached, page_count, chunk_count, char_count and
+        timings_ms per stage, plus text_handle (an artifact handle other servers can read the text
+        from; the caller owns one reference and gives it back with release_artifact). With
+        memory_ceiling_mb, also memory: ceiling_mb, peak_rss_mb, over_ceiling (the RSS went above the
+        ceiling at some point) and window_pages (the final window size).
+    """
+    options = options or {}
+    doc_id = options.get("doc_id")
+    chunk_size = int(options.get("chunk_size", 500))
+    window_pages = max(1, int(options.get("window_pages", 20)))
+    memory_ceiling_mb = options.get("memory_ceiling_mb")
+    keep_text = options.get("keep_text", True)
+    text_backend = options.get("text_backend")
+    timings = {"extract": 0.0, "chunk": 0.0, "embed": 0.0, "store": 0.0}
+    peak_rss_mb = 0.0
+    started = time.perf_counter()
+    try:
+        catalog = get_catalog()
+        content_hash = file_sha256(pdf_path)
+        settings = _ingest_settings("eager", options.get("pages"), options.get("ocr_lang"), text_backend, chunk_size)
+        doc_id, entry = _resolve_doc_id(catalog, doc_id, content_hash, settings)
+        store = get_vector_store()
+        if (entry and not options.get("force") and entry["status"] == "complete"
+                and entry["settings"] == settings and entry["embedding_model"] == _embedding_model()
+                and store.has_document(doc_id)):
+            catalog.touch(doc_id)
+            text_handle = None
+            if keep_text and entry["text_handle"]:
+                try:
+                    get_artifact_store().retain(entry["text_handle"])  # The caller owns a reference, as after an ingest
+                    text_handle = entry["text_handle"]
+                except KeyError:
+                    pass  # Expired; callers fall back to extracting the text
+            metrics.inc("catalog_hits", "ingest")
+            return {
+                "doc_id": doc_id,
+                "content_hash": content_hash,
+                "cached": True,
+                "page_count": entry["page_count"],
+                "chunk_count": entry["chunk_count"],
+                "char_count": entry["char_count"],
+                "timings_ms": {"total": round((time.perf_counter() - started) * 1000, 2)},
+                "text_handle": text_handle
+            }
+
+        from server.llm_monitoring import LLMMonitor
+        monitor = LLMMonitor()
+        embedder = get_embeddings()
+        _drop_version(store, doc_id, entry)
+        catalog.start(doc_id, content_hash, pdf_path, settings, _embedding_model())
+
+        mark = time.perf_counter()
+        selected_pages, is_scanned, ocr_lang = extractor.plan_pages(
+            pdf_path, options.get("pages"), options.get("ocr_lang"), text_backend
+        )
+        timings["extract"] += time.perf_counter() - mark
+        with (get_artifact_store().writer() if keep_text else nullcontext()) as text_out:
+            chunk_count = char_count = 0
+            next_page = 0
+            carry = ""
+            while next_page <= len(selected_pages):
+                if next_page < len(selected_pages):
+                    window = selected_pages[next_page:next_page + window_pages]
+                    mark = time.perf_counter()
+                    text = extractor.extract_window(pdf_path, window, is_scanned, ocr_lang, text_backend)
+                    timings["extract"] += time.perf_counter() - mark
+                    char_count += len(text)
+                    if text_out:
+                        text_out.write(text.encode("utf-8") if not next_page else f"\n\n{text}".encode("utf-8"))
+                    # Windows are joined the way extract_content joins pages; the tail shorter than a chunk carries over
+                    if next_page:
+                        text = f"{carry}\n\n{text}"
+                    mark = time.perf_counter()
+                    with time_stage("chunk"):
+                        cut = len(text) - len(text) % chunk_size
+                        chunks = [text[i:i + chunk_size] for i in range(0, cut, chunk_size)]
+                        carry = text[cut:]
+                    timings["chunk"] += time.perf_counter() - mark
+                    next_page += len(window)
+                else:
+                    chunks = [carry] if carry else []
+                    next_page += 1
+                metrics.inc("items", "chunk", len(chunks))
+                if chunks:
+                    mark = time.perf_counter()
+                    with time_stage("embed_batch", items=len(chunks)):
+                        vectors = get_scheduler().run(
+                            lambda: embedder.embed_documents(chunks),
+                            priority=PRIORITY_BULK, tokens=estimate_tokens(chunks), stage="embed_batch"
+                        )
+                    embed_ms = (time.perf_counter() - mark) * 1000
+                    timings["embed"] += embed_ms / 1000
+                    monitor.log_embedding_batch(chunks, vectors, {"document_path": pdf_path, "chunk_size": chunk_size}, embed_ms)
+                    mark = time.perf_counter()
+                    store.store_document(doc_id, chunks, vectors, {"path": pdf_path}, start_index=chunk_count)
+                    timings["store"] += time.perf_counter() - mark
+                    chunk_count += len(chunks)
+                    del vectors
+                if memory_ceiling_mb:
+                    rss_mb = _process_rss_mb()
+                    peak_rss_mb = max(peak_rss_mb, rss_mb)
+                    if rss_mb > float(memory_ceiling_mb):
+                        gc.collect()
+                        rss_mb = _process_rss_mb()
+                        if rss_mb > float(memory_ceiling_mb):
+                            if window_pages == 1:
+                                raise MemoryError(
+                                    f"RSS {rss_mb:.0f} MB is above memory_ceiling_mb={memory_ceiling_mb} with one-page "
+                                    f"windows; stopped after {min(next_page, len(selected_pages))} of {len(selected_pages)} pages"
+                                )
+                            window_pages = max(1, window_pages // 2)
+
+        text_handle = text_out.handle if text_out else None
+        if text_handle:
+            get_artifact_store().retain(text_handle)  # The catalog's reference, handed on by later catalog hits
+        catalog.complete(doc_id, len(selected_pages), chunk_count, char_count, text_handle)
+        timings["total"] = time.perf_counter() - started
+        result = {
+            "doc_id": doc_id,
+            "content_hash": content_hash,
+            "cached": False,
+            "page_count": len(selected_pages),
+            "chunk_count": chunk_count,
+            "char_count": char_count,
+            "timings_ms": {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()},
+            "text_handle": text_handle
+        }
+        if memory_ceiling_mb:
+            result["memory"] = {
+                "ceiling_mb": float(memory_ceiling_mb),
+                "peak_rss_mb": round(peak_rss_mb, 1),
+                "over_ceiling": peak_rss_mb > float(memory_ceiling_mb),
+                "window_pages": window_pages
+            }
+        return result
+    except Exception as e:
+        return {"error": str(e), "doc_id": doc_id}
+
+@mcp.tool()
+def index_pages(
+    pdf_path: str,
+    text_backend: Optional[str] = None,
+    chunk_size: int = 500,
+    ocr_lang: Optional[str] = None
+) -> dict:
+    """
+    Builds a cheap page-level index of a PDF from its text layer and outline (no OCR, no embeddings),
+    used to decide which pages to ingest first (see ingest_pages).
+    Args:
+        pdf_path: Path to the PDF file.
+        text_backend: Text-layer backend (see extract_pdf_contents).
+        chunk_size: Chunk size the pages would be ingested with.
+        ocr_lang: Tesseract language(s) the pages would be ingested with.
+    Returns:
+        Dictionary with doc_id (of the complete version if ingested, else of the lazy version), content_hash,
+        ingested (the catalog holds a complete lazy or eager ingest with these settings and the current
+        embedding model), plan (page_count, scanned and the resolved OCR
+        language, to pass to ingest_pages), page_count, text_pages and per page: page (1-based),
+        chars, title, sections, keywords.
+    """
+    try:
+        catalog = get_catalog()
+        content_hash = file_sha256(pdf_path)
+        lazy_settings, eager_settings = (_ingest_settings(mode, None, ocr_lang, text_backend, chunk_size) for mode in ("lazy", "eager"))
+        with time_stage("index_pages"):
+            with extractor.open_document(pdf_path, text_backend) as doc:
+                index = build_page_index(doc)
+        # Scanned-PDF detection and OCR language detection, done once for all later ingest_pages calls
+        plan = {"page_count": index["page_count"], "scanned": index["text_pages"] == 0, "ocr_lang": None}
+        if plan["scanned"] and index["page_count"]:
+            import fitz
+            with fitz.open(pdf_path) as pdf:
+                plan["ocr_lang"] = extractor.ocr_engine.resolve_language(pdf, [0], ocr_lang)
+        # Either mode stores every page; a complete eager ingest serves lazy callers too (not the reverse)
+        doc_id, ingested = None, False
+        for settings in (lazy_settings, eager_settings):
+            entry = catalog.lookup(content_hash, settings, _embedding_model())
+            if entry and entry["status"] == "complete" and get_vector_store().has_document(entry["doc_id"]):
+                doc_id, ingested = entry["doc_id"], True
+                break
+        if doc_id is None:
+            doc_id, _ = _resolve_doc_id(catalog, None, content_hash, lazy_settings)
+        return {"doc_id": doc_id, "content_hash": content_hash, "ingested": ingested, "plan": plan, **index}
+    except Exception as e:
+        return {"error": str(e)}
+
+@mcp.tool()
+def ingest_pages(pdf_path: str, pages: List[int], options: Optional[dict] = None) -> dict:
+    """
+    Ingests some pages of a PDF into its document collection, leaving the pages already stored in place,
+    so a document can be ingested in any page order over several calls (lazy ingest).
+    Each page is chunked on its own and its chunks are stored with its page number.
+    Args:
+        pdf_path: Path to the PDF file (must be readable by the server).
+        pages: 1-based page numbers to ingest.
+        options: Optional settings:
+            doc_id: Document ID to store under (default: derived from the content hash and settings).
+            chunk_size: The maximum size of each chunk (default: 500).
+            start_index: Index of the first new chunk within the document; callers pass the number
+                of chunks stored by earlier calls (default: 0).
+            reset: Delete the existing collection first and start a new catalog entry (default: False).
+                Later calls add their pages to that entry, which is complete once every page is in.
+            ocr_lang: Tesseract language(s) for scanned PDFs.
+            text_backend: Text-layer backend for this document (see extract_pdf_contents).
+            plan: The plan returned by index_pages; skips scanned-PDF and OCR language detection.
+    Returns:
+        Dictionary with doc_id, pages (ingested), chunk_count and timings_ms per stage.
+    """
+    options = options or {}
+    doc_id = options.get("doc_id")
+    chunk_size = int(options.get("chunk_size", 500))
+    start_index = int(options.get("start_index", 0))
+    timings = {"extract": 0.0, "chunk": 0.0, "embed": 0.0, "store": 0.0}
+    started = time.perf_counter()
+    try:
+        catalog = get_catalog()
+        content_hash = file_sha256(pdf_path)
+        settings = _ingest_settings("lazy", None, options.get("ocr_lang"), options.get("text_backend"), chunk_size)
+        doc_id, entry = _resolve_doc_id(catalog, doc_id, content_hash, settings)
+        store = get_vector_store()
+        plan = options.get("plan")
+        page_count = plan["page_count"] if plan else extractor.page_count(pdf_path, options.get("text_backend"))
+        if options.get("reset"):
+            _drop_version(store, doc_id, entry)
+            catalog.start(doc_id, content_hash, pdf_path, settings, _embedding_model(), page_count=page_count)
+
+        mark = time.perf_counter()
+        pages_str = ",".join(str(page) for page in pages)
+        if plan:
+            selected_pages = extractor.parse_pages(pages_str, page_count)
+            is_scanned, ocr_lang = plan["scanned"], plan["ocr_lang"]
+        else:
+            selected_pages, is_scanned, ocr_lang = extractor.plan_pages(
+                pdf_path, pages_str, options.get("ocr_lang"), options.get("text_backend")
+            )
+        timings["extract"] += time.perf_counter() - mark
+        page_chunks = []
+        for page in selected_pages:
+            mark = time.perf_counter()
+            text = extractor.extract_window(pdf_path, [page], is_scanned, ocr_lang, options.get("text_backend"))
+            timings["extract"] += time.perf_counter() - mark
+            mark = time.perf_counter()
+            with time_stage("chunk"):
+                page_chunks.append((page + 1, [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]))
+            timings["chunk"] += time.perf_counter() - mark
+        chunks = [chunk for _, page_texts in page_chunks for chunk in page_texts]
+        metrics.inc("items", "chunk", len(chunks))
+
+        if chunks:
+            mark = time.perf_counter()
+            embedder = get_embeddings()
+            with time_stage("embed_batch", items=len(chunks)):
+                vectors = get_scheduler().run(
+                    lambda: embedder.embed_documents(chunks),
+                    priority=PRIORITY_BULK, tokens=estimate_tokens(chunks), stage="embed_batch"
+                )
+            timings["embed"] += time.perf_counter() - mark
+            mark = time.perf_counter()
+            offset = 0
+            for page, page_texts in page_chunks:
+                if page_texts:
+                    store.store_document(
+                        doc_id, page_texts, vectors[offset:offset + len(page_texts)],
+                        {"path": pdf_path, "page": page}, start_index=start_index + offset
+                    )
+                    offset += len(page_texts)
+            timings["store"] += time.perf_counter() - mark
+        catalog.add_pages(doc_id, len(page_chunks), len(chunks))
+
+        timings["total"] = time.perf_counter() - started
+        return {
+            "doc_id": doc_id,
+            "pages": [page for page, _ in page_chunks],
+            "chunk_count": len(chunks),
+            "timings_ms": {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+        }
+    except Exception as e:
+        return {"error": str(e), "doc_id": doc_id}
+
+@mcp.tool()
+def list_documents(limit: int = 100, offset: int = 0) -> List[dict]:
+    """
+    Lists ingested documents from the catalog, most recently ingested first.
+    Args:
+        limit: Maximum number of entries (default: 100).
+        offset: Entries to skip, for paging (default: 0).
+    Returns:
+        List of catalog entries: doc_id, content_hash, source_path, status, page_count, pages_ingested,
+        chunk_count, char_count, settings, embedding_model, ingested_at, last_used_at.
+    """
+    entries = get_catalog().list_documents(limit, offset)
+    for entry in entries:
+        entry.pop("text_handle", None)  # References are handed out by ingest_pdf only
+    return entries
+
+@mcp.tool()
+def release_artifact(handle: str) -> int:
+    """
+    Gives back a reference to an artifact (e.g. the text_handle returned by ingest_pdf).
+    Args:
+        handle: The artifact handle.
+    Returns:
+        The number of references left; unreferenced artifacts are deleted after their TTL.
+    """
+    return get_artifact_store().release(handle)
+
+def warmup():
+    """Loads extraction dependencies, the embeddings client and the vector store ahead of the first call."""
+    from pdf_extractor import warmup as warmup_extractor
+    warmup_extractor()
+    get_vector_store()
+    get_artifact_store().cleanup()
+    try:
+        get_embeddings()
+    except ValueError:
+        pass  # No credentials configured; embed_chunks will report it
+
 @mcp.resource("pdf://status")
 def pdf_status_resource() -> str:
     """Get status of PDF processing capabilities"""
     return "PDF extraction, chunking, and embedding services are active"
 
+@mcp.resource("pdf://metrics")
+def pdf_metrics_resource() -> str:
+    """Per-stage call counts and latency percentiles (JSON) for this server process"""
+    return json.dumps(metrics.snapshot())
+
+@mcp.resource("pdf://metrics/prometheus")
+def pdf_metrics_prometheus_resource() -> str:
+    """Per-stage counters and latency histograms in Prometheus text format"""
+    return metrics.render_prometheus()
+
+@mcp.resource("pdf://artifacts")
+def pdf_artifacts_resource() -> str:
+    """Number and total size of artifacts in the shared artifact store (JSON)"""
+    return json.dumps(get_artifact_store().stats())
+
+@mcp.resource("pdf://catalog")
+def pdf_catalog_resource() -> str:
+    """Number of cataloged documents and chunks, and the catalog path (JSON)"""
+    return json.dumps(get_catalog().stats())
+
+@mcp.resource("pdf://vector-store")
+def pdf_vector_store_resource() -> str:
+    """Vector store writer statistics: queue depth, batch size limit, batches and records written (JSON)"""
+    return json.dumps(get_vector_store().stats())
+
+@mcp.resource("pdf://clients")
+def pdf_clients_resource() -> str:
+    """Model client registry, HTTP connection-pool and request scheduler statistics (JSON)"""
+    return json.dumps({**client_stats(), "scheduler": get_scheduler().stats()})
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    from server.serve import serve
+    start_http_server_from_env("PDF_METRICS_PORT")
+    serve(mcp, warmup)
\ No newline at end of file
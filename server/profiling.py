@@ -0,0 +1,170 @@
+import cProfile
+import functools
+import inspect
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+MODES = ("deterministic", "sampling", "both")
+
+class StackSampler:
+    """
+    Samples the Python stack of one thread at a fixed interval and counts collapsed stacks
+    ('outer;inner;leaf count' lines, the input format of flamegraph.pl and speedscope).
+    """
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(self._frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path) -> None:
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()))
+
+class ToolProfiler:
+    """
+    Opt-in profiling of MCP tool calls.
+    - PROFILE_TOOLS: '1'/'all' profiles every tool, or a comma-separated list of tool names (default: off).
+    - PROFILE_SAMPLE_RATE: fraction of enabled calls that are profiled (default 1.0).
+    - PROFILE_MODE: 'deterministic' (cProfile -> .pstats), 'sampling' (stack sampler -> .collapsed) or 'both'.
+    - PROFILE_INTERVAL_MS: stack sampling interval (default 5).
+    - PROFILE_DIR: where profile files and index.jsonl (one line per profiled call) go (default 'profiles').
+    Every tool also gets a `profile` argument that profiles that call regardless of the settings above.
+    """
+    def __init__(self):
+        tools = os.getenv("PROFILE_TOOLS", "").strip()
+        self.all_tools = tools.lower() in ("1", "true", "all", "*")
+        self.tools = set() if self.all_tools else {name.strip() for name in tools.split(",") if name.strip()}
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+        self.mode = os.getenv("PROFILE_MODE", "both")
+        if self.mode not in MODES:
+            raise ValueError(f"PROFILE_MODE must be one of {MODES}, got {self.mode!r}")
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+        self.profile_dir = Path(os.getenv("PROFILE_DIR", "profiles"))
+        self._sequence = itertools.count()
+
+    def should_profile(self, tool_name: str, requested: bool) -> bool:
+        if requested:
+            return True
+        if not (self.all_tools or tool_name in self.tools):
+            return False
+        return random.random() < self.sample_rate
+
+    def _start(self):
+        profiler = cProfile.Profile() if self.mode in ("deterministic", "both") else None
+        sampler = StackSampler(threading.get_ident(), self.interval) if self.mode in ("sampling", "both") else None
+        if sampler:
+            sampler.__enter__()
+        if profiler:
+            profiler.enable()
+        return profiler, sampler, time.perf_counter()
+
+    def _finish(self, tool_name: str, state, error: bool) -> None:
+        profiler, sampler, started = state
+        duration_ms = (time.perf_counter() - started) * 1000
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.__exit__(None, None, None)
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{tool_name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}"
+        files = []
+        if profiler:
+            profiler.dump_stats(self.profile_dir / f"{stem}.pstats")
+            files.append(f"{stem}.pstats")
+        if sampler:
+            sampler.write(self.profile_dir / f"{stem}.collapsed")
+            files.append(f"{stem}.collapsed")
+        entry = {"tool": tool_name, "timestamp": time.time(), "duration_ms": round(duration_ms, 2), "error": error, "files": files}
+        with open(self.profile_dir / "index.jsonl", "a") as index:
+            index.write(json.dumps(entry) + "\n")
+
+    def wrap(self, fn):
+        """Returns fn with an extra `profile: bool = False` argument that records profiles per call."""
+        tool_name = fn.__name__
+        signature = inspect.signature(fn)
+        profile_param = inspect.Parameter("profile", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool)
+        params = list(signature.parameters.values())
+        # Keyword-only parameters must come after any positional ones but before **kwargs
+        insert_at = next((i for i, p in enumerate(params) if p.kind == inspect.Parameter.VAR_KEYWORD), len(params))
+        params.insert(insert_at, profile_param)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, profile: bool = False, **kwargs):
+                # Coroutines interleave on the event loop; their profiles include whatever else ran meanwhile
+                if not self.should_profile(tool_name, profile):
+                    return await fn(*args, **kwargs)
+                state = self._start()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    self._finish(tool_name, state, error=True)
+                    raise
+                self._finish(tool_name, state, error=False)
+                return result
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, profile: bool = False, **kwargs):
+                if not self.should_profile(tool_name, profile):
+                    return fn(*args, **kwargs)
+                state = self._start()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException:
+                    self._finish(tool_name, state, error=True)
+                    raise
+                self._finish(tool_name, state, error=False)
+                return result
+
+        wrapper.__signature__ = signature.replace(parameters=params)
+        return wrapper
+
+def install(mcp) -> ToolProfiler:
+    """
+    Makes `@mcp.tool()` register profiled wrappers of the decorated functions.
+    Call right after creating the FastMCP instance. The decorator still returns the original
+    function, so direct in-process calls (tools calling tools) are not profiled separately.
+    """
+    profiler = ToolProfiler()
+    register_tool = mcp.tool
+
+    def tool(*args, **kwargs):
+        register = register_tool(*args, **kwargs)
+        def decorator(fn):
+            register(profiler.wrap(fn))
+            return fn
+        return decorator
+
+    mcp.tool = tool
+    return profiler
@@ -0,0 +1,33 @@
+import argparse
+import sys
+import time
+from typing import Callable, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+def serve(mcp: FastMCP, warmup: Optional[Callable[[], None]] = None) -> None:
+    """
+    Runs an MCP server from the command line.
+    By default the server speaks stdio and is spawned per call by the clients. With
+    --transport streamable-http it stays up, and --warm runs `warmup` (heavy imports,
+    vector store, model clients) before accepting requests so the first call is not a cold one.
+    Clients find a running server through <SCRIPT_STEM>_URL, see modules/mcp_client.py.
+    """
+    parser = argparse.ArgumentParser(description=f"MCP server: {mcp.name}")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--warm", action="store_true", help="Preload dependencies before serving")
+    args = parser.parse_args()
+
+    if args.warm and warmup:
+        start = time.perf_counter()
+        warmup()
+        # stdout is reserved for the stdio transport
+        print(f"[{mcp.name}] warm-up finished in {time.perf_counter() - start:.2f}s", file=sys.stderr, flush=True)
+    if args.transport == "stdio":
+        from server import tracing
+        tracing.flush_after_call = True
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    mcp.run(transport=args.transport)
@@ -1,24 +1,48 @@
-from mcp.server.fastmcp import FastMCP
-from typing import List, Union
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from mcp.server.fastmcp import FastMCP, Context
+from typing import List, Optional, Tuple, Union
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 import asyncio
-from pathlib import Path
-from server.vector_store import VectorStore
+import os
+import re
+import time
+from server.vector_store import get_vector_store
+from server.doc_catalog import get_catalog
+from server.llm_clients import get_chat_model, get_embeddings, client_stats
+from server.model_scheduler import get_scheduler, estimate_tokens, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from server.metrics import registry as metrics, time_stage, start_http_server_from_env
+from server.profiling import install as install_profiling
+from server.tracing import instrument as instrument_tracing
+from server.artifact_store import get_artifact_store
+from server.context_builder import ContextBuilder, group_by_shared_chunks
+from opentelemetry import trace
+import json
 
 mcp = FastMCP(
     name="summarizer_qna_server"
 )
+instrument_tracing(mcp, "summarizer_qna_server")  # joins the caller's trace, see server/tracing.py
+install_profiling(mcp)  # opt-in per-call profiles, see server/profiling.py
+context_builder = ContextBuilder()  # settings from CONTEXT_* env vars
 
-def get_api_key():
-    env_path = Path(__file__).parent.parent / '.env'
-    if env_path.exists():
-        with open(env_path) as f:
-            for line in f:
-                if line.startswith('OPENAI_API_KEY='):
-                    return line.strip().split('=')[1]
-    return None
+def answer_prompt(context: str, question: str) -> str:
+    return f"Answer the following question based on the provided context.\n\nContext:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+
+def group_answer_prompt(context: str, questions: List[str]) -> str:
+    numbered = "\n".join(f"{n}. {question}" for n, question in enumerate(questions, 1))
+    return (
+        "Answer each of the following questions based on the provided context. "
+        "Reply with one answer per question, numbered like the questions (\"1. ...\").\n\n"
+        f"Context:\n{context}\n\nQuestions:\n{numbered}\n\nAnswers:"
+    )
+
+def split_numbered_answers(text: str, count: int) -> Optional[List[str]]:
+    """The answers 1..count of a numbered reply, or None if the reply doesn't number exactly that many."""
+    parts = re.split(r"^\s*(\d+)[.):]\s+", text.strip(), flags=re.MULTILINE)
+    numbers = [int(n) for n in parts[1::2]]
+    if numbers != list(range(1, count + 1)):
+        return None
+    return [answer.strip() for answer in parts[2::2]]
 
 def run_async(coro):
     try:
@@ -31,62 +55,279 @@ def run_async(coro):
         return asyncio.run(coro)
 
 @mcp.tool()
-def summarize_text(text: Union[str, List[str]]) -> str:
+def summarize_text(text: Union[str, List[str], None] = None, text_handle: Optional[str] = None) -> str:
     """
     Generates a summary for the input text or list of text chunks using an LLM (OpenAI).
     Args:
         text: A string or list of text chunks to summarize.
+        text_handle: Artifact handle of the text (e.g. from ingest_pdf), read from the shared
+            artifact store instead of being sent in the request.
     Returns:
         A summary string.
     """
+    if text_handle:
+        text = get_artifact_store().get_text(text_handle)
+    if text is None:
+        raise ValueError("Either text or text_handle is required")
     if isinstance(text, dict) and 'text' in text:
         text = text['text']
-    api_key = get_api_key()
-    if not api_key:
-        raise ValueError("Could not find OPENAI_API_KEY in .env file")
-    llm = ChatOpenAI(model="gpt-4-turbo-preview", api_key=api_key)
+    llm = get_chat_model()
     if isinstance(text, list):
         text = "\n".join(text)
     prompt = f"Summarize the following document or text chunks as concisely as possible:\n\n{text}"
-    return llm.invoke(prompt)
-
-vector_store = VectorStore()
+    with time_stage("llm"):
+        return get_scheduler().run(
+            lambda: llm.invoke(prompt).content,
+            priority=PRIORITY_INTERACTIVE, tokens=estimate_tokens(prompt), stage="llm"
+        )
 
 @mcp.tool()
 def answer_question(question: str, doc_id: str, top_k: int = 5) -> str:
     """
     Answers a user question using Retrieval-Augmented Generation (RAG):
     1. Embeds the question
-    2. Retrieves relevant chunks from the vector store (direct call)
-    3. Uses an LLM to answer based on the retrieved context
+    2. Retrieves candidate chunks from the vector store (direct call), CONTEXT_FETCH_FACTOR x top_k
+    3. Compresses them into the context (see server/context_builder.py): duplicates removed,
+       MMR diversity, adjacent chunks merged, packed to CONTEXT_TOKEN_BUDGET
+    4. Uses an LLM to answer based on that context
+    Tokens in and out (against joining the top_k chunks) are counted in the metrics (stage 'context');
+    the signed tokens_saved is recorded on the tool's trace span.
     Args:
         question: The user's question
         doc_id: The document ID to search within
-        top_k: Number of relevant chunks to retrieve
+        top_k: Maximum number of chunks used in the context
     Returns:
         The answer string
     """
-    api_key = get_api_key()
-    if not api_key:
-        raise ValueError("Could not find OPENAI_API_KEY in .env file")
-
     # 1. Embed the question
-    embedder = OpenAIEmbeddings(api_key=api_key)
-    question_embedding = embedder.embed_query(question)
+    embedder = get_embeddings()
+    with time_stage("embed_query"):
+        question_embedding = get_scheduler().run(
+            lambda: embedder.embed_query(question),
+            priority=PRIORITY_INTERACTIVE, tokens=estimate_tokens(question), stage="embed_query"
+        )
+
+    # 2. Retrieve candidate chunks from the vector store (direct call)
+    fetch_k = max(top_k, int(top_k * float(os.getenv("CONTEXT_FETCH_FACTOR", "2"))))
+    chunks = get_vector_store().query_chunks(doc_id, question_embedding, fetch_k)
+    get_catalog().record_query(doc_id)  # Frequently asked documents are preloaded at the next warm start
+
+    # 3. Deduplicate, diversify, merge and trim to the token budget
+    with time_stage("context"):
+        context, stats = context_builder.build(question_embedding, chunks, max_chunks=top_k)
+    for name in ("tokens_in", "tokens_out", "duplicates_removed"):  # Counters only grow; saved = in - out
+        metrics.inc(name, "context", stats[name])
+    span = trace.get_current_span()
+    for name, value in stats.items():
+        span.set_attribute(f"context.{name}", value)
+
+    # 4. Use LLM to answer based on context
+    llm = get_chat_model()
+    prompt = answer_prompt(context, question)
+    with time_stage("llm"):
+        return get_scheduler().run(
+            lambda: llm.invoke(prompt).content,
+            priority=PRIORITY_INTERACTIVE, tokens=estimate_tokens(prompt), stage="llm"
+        )
+
+@mcp.tool()
+async def answer_questions(
+    doc_id: str,
+    questions: List[str],
+    top_k: int = 5,
+    max_concurrency: Optional[int] = None,
+    group_shared_context: bool = False,
+    ctx: Context = None
+) -> dict:
+    """
+    Answers a questionnaire about one document (answer_question for many questions at once):
+    1. Embeds all questions in one batch
+    2. Retrieves CONTEXT_FETCH_FACTOR x top_k candidate chunks per question in a single multi-query
+    3. Builds each question's context (see server/context_builder.py)
+    4. Runs the LLM calls concurrently, at most max_concurrency at a time (QNA_BULK_CONCURRENCY,
+       default 8), at bulk priority so single questions asked meanwhile go first
+    With group_shared_context, questions whose retrieved chunks mostly overlap (Jaccard >= 0.5, up to
+    5 per group) share one context and one LLM call that answers them as a numbered list; a group
+    whose reply can't be split is asked again one question at a time.
+    Each answer is streamed as a progress notification as soon as it is ready (message: the answer
+    entry as JSON), if the client sent a progress token.
+    Args:
+        doc_id: The document ID to search within
+        questions: The questions to answer
+        top_k: Maximum number of chunks used in each context
+        max_concurrency: Maximum number of LLM calls in flight
+        group_shared_context: Whether to answer questions with shared context in one call
+    Returns:
+        {"doc_id", "answers": [{"index", "question", "answer", "latency_ms", "error"?}] in question order,
+         "groups": question indices answered together, "llm_calls", "context": summed context stats,
+         "timings_ms": {"embed", "retrieve", "context", "llm", "total"}}
+    """
+    started = time.perf_counter()
+    timings = {}
+    scheduler = get_scheduler()
+    max_concurrency = max(1, max_concurrency or int(os.getenv("QNA_BULK_CONCURRENCY", "8")))
+    if not questions:
+        return {"doc_id": doc_id, "answers": [], "groups": [], "llm_calls": 0, "context": {}, "timings_ms": {"total": 0.0}}
+
+    # 1. Embed all questions in one request
+    step = time.perf_counter()
+    embedder = get_embeddings()
+    with time_stage("embed_query", items=len(questions)):
+        embeddings = await asyncio.to_thread(
+            scheduler.run, lambda: embedder.embed_documents(questions),
+            priority=PRIORITY_INTERACTIVE, tokens=estimate_tokens(questions), stage="embed_query"
+        )
+    timings["embed"] = (time.perf_counter() - step) * 1000
+
+    # 2. One collection query for all questions
+    step = time.perf_counter()
+    fetch_k = max(top_k, int(top_k * float(os.getenv("CONTEXT_FETCH_FACTOR", "2"))))
+    retrieved = await asyncio.to_thread(get_vector_store().query_chunks_many, doc_id, embeddings, fetch_k)
+    get_catalog().record_query(doc_id, len(questions))
+    timings["retrieve"] = (time.perf_counter() - step) * 1000
 
-    # 2. Retrieve relevant chunks from the vector store (direct call)
-    chunks = vector_store.query_similar(doc_id, question_embedding, top_k)
-    context = "\n".join(chunks)
+    # 3. One context per question, or per group of questions sharing most of their chunks
+    step = time.perf_counter()
+    if group_shared_context:
+        groups = group_by_shared_chunks([[chunk["id"] for chunk in chunks[:top_k]] for chunks in retrieved])
+    else:
+        groups = [[i] for i in range(len(questions))]
+    context_stats = {}
+
+    def count_context(stats: dict, sign: int = 1):
+        for name, value in stats.items():
+            context_stats[name] = context_stats.get(name, 0) + sign * value
+
+    def build_prompt(group: List[int]) -> Tuple[str, dict]:
+        if len(group) == 1:
+            context, stats = context_builder.build(embeddings[group[0]], retrieved[group[0]], max_chunks=top_k)
+        else:
+            # Chunks retrieved for any member, closest first; ranked against the members' mean embedding
+            best = {}
+            for i in group:
+                for chunk in retrieved[i]:
+                    if chunk["id"] not in best or chunk["distance"] < best[chunk["id"]]["distance"]:
+                        best[chunk["id"]] = chunk
+            chunks = sorted(best.values(), key=lambda chunk: chunk["distance"])
+            query = [sum(values) / len(group) for values in zip(*(embeddings[i] for i in group))]
+            context, stats = context_builder.build(query, chunks, max_chunks=top_k * len(group))
+        if len(group) == 1:
+            return answer_prompt(context, questions[group[0]]), stats
+        return group_answer_prompt(context, [questions[i] for i in group]), stats
+
+    prompts = [build_prompt(group) for group in groups]
+    for _, stats in prompts:
+        count_context(stats)
+    timings["context"] = (time.perf_counter() - step) * 1000
+
+    # 4. Concurrent LLM calls; each answer is reported as soon as it is ready
+    step = time.perf_counter()
+    llm = get_chat_model()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    answers: List[Optional[dict]] = [None] * len(questions)
+    calls = 0
+
+    async def finish(index: int, answer: Optional[str], latency_ms: float, error: Optional[str] = None):
+        entry = {"index": index, "question": questions[index], "answer": answer, "latency_ms": round(latency_ms, 2)}
+        if error:
+            entry["error"] = error
+        answers[index] = entry
+        if ctx is not None:
+            done = sum(1 for a in answers if a is not None)
+            await ctx.report_progress(done, len(questions), message=json.dumps(entry))
+
+    async def answer(group: List[int], prompt: str, stats: dict):
+        nonlocal calls
+        async with semaphore:
+            call_started = time.perf_counter()
+            calls += 1
+            try:
+                with time_stage("llm"):
+                    text = await asyncio.to_thread(
+                        scheduler.run, lambda: llm.invoke(prompt).content,
+                        priority=PRIORITY_BULK, tokens=estimate_tokens(prompt), stage="llm"
+                    )
+                error = None
+            except Exception as e:
+                text, error = None, f"{type(e).__name__}: {e}"
+            latency_ms = (time.perf_counter() - call_started) * 1000
+        if len(group) == 1:
+            await finish(group[0], text, latency_ms, error)
+            return
+        parts = split_numbered_answers(text, len(group)) if text is not None else None
+        if parts is None:
+            # The reply didn't number one answer per question: ask them separately.
+            # Context stats describe the contexts the answers come from, so the group's are replaced.
+            metrics.inc("ungrouped", "llm", len(group))
+            count_context(stats, -1)
+            retries = [([i], *build_prompt([i])) for i in group]
+            for _, _, retry_stats in retries:
+                count_context(retry_stats)
+            await asyncio.gather(*(answer(*retry) for retry in retries))
+            return
+        for i, part in zip(group, parts):
+            await finish(i, part, latency_ms)
+
+    await asyncio.gather(*(answer(group, prompt, stats) for group, (prompt, stats) in zip(groups, prompts)))
+    timings["llm"] = (time.perf_counter() - step) * 1000
+    timings["total"] = (time.perf_counter() - started) * 1000
 
-    # 3. Use LLM to answer based on context
-    llm = ChatOpenAI(model="gpt-4-turbo-preview", api_key=api_key)
-    prompt = f"Answer the following question based on the provided context.\n\nContext:\n{context}\n\nQuestion: {question}\n\nAnswer:"
-    return llm.invoke(prompt)
+    for name in ("tokens_in", "tokens_out", "duplicates_removed"):  # Counters only grow; saved = in - out
+        metrics.inc(name, "context", context_stats.get(name, 0))
+    metrics.observe("answer_questions", timings["total"])
+    span = trace.get_current_span()
+    span.set_attribute("questions", len(questions))
+    span.set_attribute("groups", len(groups))
+    span.set_attribute("llm_calls", calls)
+    for name, value in timings.items():
+        span.set_attribute(f"{name}_ms", value)
+    return {
+        "doc_id": doc_id,
+        "answers": answers,
+        "groups": [group for group in groups if len(group) > 1],
+        "llm_calls": calls,
+        "context": context_stats,
+        "timings_ms": {name: round(value, 2) for name, value in timings.items()},
+    }
 
-@mcp.resource("summarizer_qna://status")
+def warmup():
+    """
+    Loads the vector store and model clients ahead of the first call, and the indexes of the
+    VECTOR_PRELOAD_DOCS (default 4) most recently/frequently queried documents.
+    """
+    get_vector_store().preload(get_catalog().hot_documents(int(os.getenv("VECTOR_PRELOAD_DOCS", "4"))))
+    try:
+        get_embeddings()
+        get_chat_model()
+    except ValueError:
+        pass  # No credentials configured; the tools will report it
+
+@mcp.resource("summarizer-qna://status")
 def summarizer_qna_status_resource() -> str:
     """Get status of summarizer and QnA services"""
     return "Summarization and QnA services are active"
 
+@mcp.resource("summarizer-qna://metrics")
+def summarizer_qna_metrics_resource() -> str:
+    """Per-stage call counts and latency percentiles (JSON) for this server process"""
+    return json.dumps(metrics.snapshot())
+
+@mcp.resource("summarizer-qna://metrics/prometheus")
+def summarizer_qna_metrics_prometheus_resource() -> str:
+    """Per-stage counters and latency histograms in Prometheus text format"""
+    return metrics.render_prometheus()
+
+@mcp.resource("summarizer-qna://vector-store")
+def summarizer_qna_vector_store_resource() -> str:
+    """Open collection handles (LRU), hits/misses/evictions, preload results and writer statistics (JSON)"""
+    return json.dumps(get_vector_store().stats())
+
+@mcp.resource("summarizer-qna://clients")
+def summarizer_qna_clients_resource() -> str:
+    """Model client registry, HTTP connection-pool and request scheduler statistics (JSON)"""
+    return json.dumps({**client_stats(), "scheduler": get_scheduler().stats()})
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    from server.serve import serve
+    start_http_server_from_env("QNA_METRICS_PORT")
+    serve(mcp, warmup)
\ No newline at end of file
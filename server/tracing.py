@@ -1,39 +1,142 @@
-from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.semconv.resource import ResourceAttributes
+from opentelemetry import trace, propagate
 import os
+import threading
+import time
+
+_setup_lock = threading.Lock()
+# Set by server.serve for stdio servers: clients terminate them when the session closes,
+# before the batch span processor would export, so spans are flushed after every call
+flush_after_call = False
 
 def setup_tracing(service_name: str):
     """
     Set up OpenTelemetry tracing for the service.
+    Sampling is parent-based: spans continuing a remote trace (e.g. a tool call from the
+    pipeline) follow the caller's decision, new traces are sampled at TRACE_SAMPLE_RATE (default 1.0).
+    Spans go to the OTLP exporter when TRACE_EXPORTER=otlp, or by default when an
+    OTEL_EXPORTER_OTLP_(TRACES_)ENDPOINT is configured; TRACE_EXPORTER=console prints them to stderr.
     Args:
         service_name: Name of the service for tracing
     """
+    # Imported here so processes that never trace don't pay for the SDK at import time
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.semconv.resource import ResourceAttributes
+
     # Create a resource with service information
     resource = Resource.create({
         ResourceAttributes.SERVICE_NAME: service_name,
         ResourceAttributes.SERVICE_VERSION: "0.1.0",
     })
 
-    # Create and set the tracer provider
-    provider = TracerProvider(resource=resource)
-    processor = BatchSpanProcessor(OTLPSpanExporter())
-    provider.add_span_processor(processor)
+    sampler = ParentBased(TraceIdRatioBased(float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))))
+    provider = TracerProvider(resource=resource, sampler=sampler)
+    has_endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+    exporter_name = os.getenv("TRACE_EXPORTER", "otlp" if has_endpoint else "none").lower()
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    elif exporter_name == "console":
+        import sys
+        # stderr: stdout is the transport of stdio servers
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter(out=sys.stderr)))
     trace.set_tracer_provider(provider)
 
     return trace.get_tracer(service_name)
 
 def get_tracer(service_name: str):
     """
-    Get a tracer for the service. If tracing is not set up, set it up first.
+    Get a tracer for the service. If tracing is not set up in this process, set it up first
+    (once; a provider installed by someone else, e.g. phoenix.otel.register, is kept).
     Args:
         service_name: Name of the service for tracing
     Returns:
         An OpenTelemetry tracer instance
     """
-    if not trace.get_tracer_provider():
-        setup_tracing(service_name)
-    return trace.get_tracer(service_name) 
\ No newline at end of file
+    # The default global provider is a proxy that never records; any SDK provider means setup happened
+    if isinstance(trace.get_tracer_provider(), trace.ProxyTracerProvider):
+        with _setup_lock:
+            if isinstance(trace.get_tracer_provider(), trace.ProxyTracerProvider):
+                setup_tracing(service_name)
+    return trace.get_tracer(service_name)
+
+def inject_trace_context() -> dict:
+    """
+    W3C trace context (traceparent/tracestate) of the current span, plus the send time,
+    for the `_meta` of an outgoing MCP request.
+    """
+    carrier = {}
+    propagate.inject(carrier)
+    carrier["client_send_ns"] = time.time_ns()
+    return carrier
+
+def instrument(mcp, service_name: str) -> None:
+    """
+    Makes `@mcp.tool()` register tools that continue the caller's trace.
+    Each call records a `mcp.inbound` span covering transport and queueing (from the client's
+    send time to the start of the tool; both processes share the machine clock) and a
+    `tool <name>` span covering the server time. Call right after creating the FastMCP instance.
+    """
+    import functools
+    import inspect
+    register_tool = mcp.tool
+
+    def request_meta() -> dict:
+        request_context = mcp.get_context().request_context
+        meta = request_context.meta if request_context else None
+        return meta.model_dump() if meta else {}
+
+    def start_spans(tool_name: str):
+        started_ns = time.time_ns()
+        tracer = get_tracer(service_name)
+        meta = request_meta()
+        parent = propagate.extract(meta)
+        send_ns = meta.get("client_send_ns")
+        if isinstance(send_ns, int) and 0 < send_ns <= started_ns:
+            inbound = tracer.start_span("mcp.inbound", context=parent, start_time=send_ns)
+            inbound.set_attribute("mcp.tool", tool_name)
+            inbound.end(end_time=started_ns)
+        span = tracer.start_span(f"tool {tool_name}", context=parent, start_time=started_ns)
+        span.set_attribute("mcp.tool", tool_name)
+        if isinstance(send_ns, int):
+            span.set_attribute("mcp.inbound_ms", (started_ns - send_ns) / 1e6)
+        return span
+
+    def flush():
+        if flush_after_call:
+            provider = trace.get_tracer_provider()
+            if hasattr(provider, "force_flush"):
+                provider.force_flush(timeout_millis=2000)
+
+    def wrap(fn):
+        tool_name = fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                span = start_spans(tool_name)
+                try:
+                    with trace.use_span(span, end_on_exit=True):
+                        return await fn(*args, **kwargs)
+                finally:
+                    flush()
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                span = start_spans(tool_name)
+                try:
+                    with trace.use_span(span, end_on_exit=True):
+                        return fn(*args, **kwargs)
+                finally:
+                    flush()
+        return wrapper
+
+    def tool(*args, **kwargs):
+        register = register_tool(*args, **kwargs)
+        def decorator(fn):
+            register(wrap(fn))
+            return fn
+        return decorator
+
+    mcp.tool = tool
@@ -1,37 +1,234 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
 from typing import List, Optional
-import chromadb
-from chromadb.config import Settings
+import os
+import queue
+import threading
+import time
 from pathlib import Path
+from server.metrics import registry as metrics, time_stage
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are serialized within one process only
+    fcntl = None
+
+# Chroma's own limit when the client can't report one (SQLite's maximum number of bound variables / fields)
+DEFAULT_MAX_BATCH_SIZE = 5461
 
 class VectorStore:
-    def __init__(self, persist_directory: str = "vector_db"):
+    """
+    ChromaDB store of document chunks, one collection per document.
+    All writes (store_document, delete_document) go through one writer thread per process, which
+    coalesces queued inserts for the same document and commits them in batches of at most
+    max_batch_size records (VECTOR_DB_MAX_BATCH, capped by the client's get_max_batch_size()).
+    Each batch holds an exclusive lock on <persist_directory>/write.lock, so processes sharing the
+    directory take turns instead of contending for Chroma's SQLite file.
+    Reads never wait for the writer. They go through an LRU of open collection handles bounded by
+    VECTOR_CACHE_COLLECTIONS handles (default 32) and VECTOR_CACHE_MEMORY_MB of estimated index memory
+    (default 1024), which is also Chroma's own LRU segment cache limit. preload() opens documents and
+    loads their HNSW indexes ahead of the first query.
+    """
+    def __init__(self, persist_directory: Optional[str] = None):
+        persist_directory = persist_directory or os.getenv("VECTOR_DB_DIR", "vector_db")
         self.persist_directory = persist_directory
         Path(persist_directory).mkdir(parents=True, exist_ok=True)
-        
+
+        # Imported here so modules that only reference VectorStore don't pay for chromadb at import time
+        import chromadb
+        import chromadb.errors
+        from chromadb.config import Settings
+        # Raised for a deleted or re-created collection (InvalidCollectionException before chromadb 0.6)
+        self._stale_errors = tuple(
+            getattr(chromadb.errors, name) for name in ("NotFoundError", "InvalidCollectionException")
+            if hasattr(chromadb.errors, name)
+        )
+        self.cache_capacity = int(os.getenv("VECTOR_CACHE_COLLECTIONS", "32"))
+        self.cache_budget_bytes = int(float(os.getenv("VECTOR_CACHE_MEMORY_MB", "1024")) * 1024 * 1024)
         self.client = chromadb.Client(Settings(
             persist_directory=persist_directory,
-            is_persistent=True
+            is_persistent=True,
+            # Loaded segments (HNSW indexes) are evicted least recently used first beyond the budget
+            chroma_segment_cache_policy="LRU",
+            chroma_memory_limit_bytes=self.cache_budget_bytes
         ))
+        self._collections = OrderedDict()  # doc_id -> (collection, estimated bytes), least recently used first
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "preloaded": 0, "preload_ms": None}
+        try:
+            client_limit = self.client.get_max_batch_size()
+        except Exception:
+            client_limit = DEFAULT_MAX_BATCH_SIZE
+        self.max_batch_size = min(client_limit, int(os.getenv("VECTOR_DB_MAX_BATCH", str(client_limit))))
+        self.write_lock_path = Path(persist_directory) / "write.lock"
+        self._writes = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.write_stats = {"writes": 0, "batches": 0, "records": 0, "coalesced": 0}
+
+    @contextmanager
+    def _process_lock(self):
+        """Exclusive lock shared by every process writing to this persist directory."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.write_lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _submit(self, op: tuple) -> Future:
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="vector-store-writer", daemon=True)
+                    self._writer.start()
+        future = Future()
+        self._writes.put((op, future))
+        return future
+
+    def _write_loop(self):
+        while True:
+            pending = [self._writes.get()]
+            while True:  # Take everything queued meanwhile, so inserts can share batches
+                try:
+                    pending.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            self.write_stats["writes"] += len(pending)
+            # Consecutive adds to one document are committed together; deletes keep their place in the order
+            groups = []
+            for op, future in pending:
+                if op[0] == "add" and groups and groups[-1][0] == ("add", op[1]):
+                    groups[-1][1].append((op, future))
+                    self.write_stats["coalesced"] += 1
+                else:
+                    groups.append(((op[0], op[1]), [(op, future)]))
+            for (kind, doc_id), items in groups:
+                futures = [future for _, future in items]
+                try:
+                    with self._process_lock():
+                        if kind == "delete":
+                            self._forget(doc_id)
+                            self.client.delete_collection(name=doc_id)
+                        else:
+                            self._add(doc_id, [op for op, _ in items])
+                except Exception as e:
+                    for future in futures:
+                        future.set_exception(e)
+                else:
+                    for future in futures:
+                        future.set_result(None)
+
+    @staticmethod
+    def _estimate_bytes(collection) -> int:
+        """Approximate index memory: float32 vectors plus about 64 bytes of graph links per record."""
+        sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+        dimensions = len(sample[0]) if sample is not None and len(sample) else 0
+        return collection.count() * (dimensions * 4 + 64)
+
+    def _collection(self, doc_id: str):
+        """Open handle of a document's collection, from the LRU or opened and cached."""
+        with self._cache_lock:
+            entry = self._collections.get(doc_id)
+            if entry is not None:
+                self._collections.move_to_end(doc_id)
+                self.cache_stats["hits"] += 1
+                return entry[0]
+        collection = self.client.get_collection(name=doc_id)
+        size = self._estimate_bytes(collection)
+        with self._cache_lock:
+            self.cache_stats["misses"] += 1
+            self._collections[doc_id] = (collection, size)
+            self._collections.move_to_end(doc_id)
+            while len(self._collections) > 1 and (
+                len(self._collections) > self.cache_capacity
+                or sum(size for _, size in self._collections.values()) > self.cache_budget_bytes
+            ):
+                self._collections.popitem(last=False)
+                self.cache_stats["evictions"] += 1
+        return collection
 
-    def store_document(self, doc_id: str, chunks: List[str], embeddings: List[List[float]], metadata: Optional[dict] = None) -> None:
+    def _forget(self, doc_id: str) -> None:
+        with self._cache_lock:
+            self._collections.pop(doc_id, None)
+
+    def preload(self, doc_ids: List[str]) -> List[str]:
+        """
+        Opens the documents' collections and runs one query against each, so their HNSW indexes are
+        in memory before the first real question. Missing documents are skipped.
+        Returns the doc_ids that were loaded.
+        """
+        started = time.perf_counter()
+        loaded = []
+        for doc_id in doc_ids[:self.cache_capacity]:
+            try:
+                collection = self._collection(doc_id)
+                sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+                if sample is not None and len(sample):
+                    collection.query(query_embeddings=[list(sample[0])], n_results=1)
+                loaded.append(doc_id)
+            except Exception:
+                self._forget(doc_id)
+        self.cache_stats["preloaded"] += len(loaded)
+        self.cache_stats["preload_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return loaded
+
+    def _query(self, doc_id: str, **kwargs) -> dict:
+        try:
+            return self._collection(doc_id).query(**kwargs)
+        except self._stale_errors:
+            # The cached handle may be stale (document re-ingested by another process); reopen once
+            self._forget(doc_id)
+            return self._collection(doc_id).query(**kwargs)
+
+    def _add(self, doc_id: str, ops: List[tuple]) -> None:
+        ids, embeddings, documents, metadatas = [], [], [], []
+        for _, _, op_ids, op_embeddings, op_documents, op_metadatas in ops:
+            ids += op_ids
+            embeddings += op_embeddings
+            documents += op_documents
+            metadatas += op_metadatas
+        collection = self.client.get_or_create_collection(name=doc_id)
+        for start in range(0, len(ids), self.max_batch_size):
+            end = start + self.max_batch_size
+            with time_stage("store_batch", items=len(ids[start:end])):
+                collection.add(
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end],
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end]
+                )
+            self.write_stats["batches"] += 1
+            self.write_stats["records"] += len(ids[start:end])
+        metrics.inc("coalesced", "store_batch", len(ops) - 1)
+
+    def store_document(
+        self,
+        doc_id: str,
+        chunks: List[str],
+        embeddings: List[List[float]],
+        metadata: Optional[dict] = None,
+        start_index: int = 0
+    ) -> None:
         """
         Store document chunks and their embeddings in ChromaDB.
+        Can be called repeatedly for consecutive parts of a document (e.g. page windows).
+        Queued for the writer thread; returns once the chunks are committed.
         Args:
             doc_id: Unique identifier for the document
             chunks: List of text chunks
             embeddings: List of embedding vectors
             metadata: Optional metadata about the document
+            start_index: Index of the first chunk within the document
         """
-        # Create or get collection for the document
-        collection = self.client.get_or_create_collection(name=doc_id)
-        
-        # Add chunks and embeddings
-        collection.add(
-            embeddings=embeddings,
-            documents=chunks,
-            ids=[f"{doc_id}_chunk_{i}" for i in range(len(chunks))],
-            metadatas=[metadata or {}] * len(chunks)
-        )
+        with time_stage("store", items=len(chunks)):
+            ids = [f"{doc_id}_chunk_{start_index + i}" for i in range(len(chunks))]
+            metadatas = [{**(metadata or {}), "chunk_index": start_index + i} for i in range(len(chunks))]
+            self._submit(("add", doc_id, ids, list(embeddings), list(chunks), metadatas)).result()
 
     def query_similar(self, doc_id: str, query_embedding: List[float], top_k: int = 5) -> List[str]:
         """
@@ -43,17 +240,87 @@ class VectorStore:
         Returns:
             List of similar text chunks
         """
-        collection = self.client.get_collection(name=doc_id)
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
+        with time_stage("retrieve"):
+            results = self._query(doc_id, query_embeddings=[query_embedding], n_results=top_k)
         return results["documents"][0]  # First list since we only have one query
 
+    def query_chunks(self, doc_id: str, query_embedding: List[float], top_k: int = 5) -> List[dict]:
+        """
+        Like query_similar, but returns each chunk with its metadata, stored embedding and distance.
+        Args:
+            doc_id: Document identifier
+            query_embedding: Query embedding vector
+            top_k: Number of similar chunks to return
+        Returns:
+            List of {"id", "text", "metadata", "embedding", "distance"}, most similar first
+        """
+        return self.query_chunks_many(doc_id, [query_embedding], top_k)[0]
+
+    def query_chunks_many(self, doc_id: str, query_embeddings: List[List[float]], top_k: int = 5) -> List[List[dict]]:
+        """
+        query_chunks for several queries against one document in a single collection query.
+        Args:
+            doc_id: Document identifier
+            query_embeddings: One embedding vector per query
+            top_k: Number of similar chunks to return per query
+        Returns:
+            One list of {"id", "text", "metadata", "embedding", "distance"} per query, in query order
+        """
+        if not query_embeddings:
+            return []
+        with time_stage("retrieve", items=len(query_embeddings)):
+            results = self._query(
+                doc_id,
+                query_embeddings=[list(embedding) for embedding in query_embeddings],
+                n_results=top_k,
+                include=["documents", "metadatas", "embeddings", "distances"]
+            )
+        return [
+            [
+                {"id": chunk_id, "text": text, "metadata": metadata or {}, "embedding": embedding, "distance": distance}
+                for chunk_id, text, metadata, embedding, distance in zip(ids, documents, metadatas, embeddings, distances)
+            ]
+            for ids, documents, metadatas, embeddings, distances in zip(
+                results["ids"], results["documents"], results["metadatas"], results["embeddings"], results["distances"]
+            )
+        ]
+
     def delete_document(self, doc_id: str) -> None:
-        """Delete a document and its chunks from the store."""
-        self.client.delete_collection(name=doc_id)
+        """Delete a document and its chunks from the store (through the writer, after writes queued before it)."""
+        self._submit(("delete", doc_id)).result()
+
+    def has_document(self, doc_id: str) -> bool:
+        """Whether the store holds a collection for the document (one lookup, no listing)."""
+        try:
+            self.client.get_collection(name=doc_id)
+        except Exception:  # chromadb raises ValueError or NotFoundError depending on the version
+            return False
+        return True
+
+    def stats(self) -> dict:
+        """Writer statistics (queued operations, batches, records, coalesced inserts) and handle cache statistics."""
+        with self._cache_lock:
+            cache = {
+                **self.cache_stats,
+                "open": list(self._collections),
+                "estimated_bytes": sum(size for _, size in self._collections.values()),
+                "capacity": self.cache_capacity,
+                "budget_bytes": self.cache_budget_bytes,
+            }
+        return {"max_batch_size": self.max_batch_size, "queued": self._writes.qsize(), **self.write_stats, "cache": cache}
 
     def list_documents(self) -> List[str]:
-        """List all document IDs in the store."""
-        return [collection.name for collection in self.client.list_collections()] 
\ No newline at end of file
+        """List all document IDs in the store. Enumerates every collection; prefer the catalog (server/doc_catalog.py)."""
+        return [collection.name for collection in self.client.list_collections()]
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+def get_vector_store() -> VectorStore:
+    """Returns the process-wide VectorStore, opening it on first use."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = VectorStore()
+    return _shared_store
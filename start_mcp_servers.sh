@@ -1,20 +1,28 @@
 #!/bin/bash
+# Starts both MCP servers in warm mode (long-lived, dependencies preloaded).
+# Point the clients at them with the printed *_URL variables; without them the
+# clients fall back to spawning a stdio server per call.
+
+mkdir -p logs
+export PYTHONPATH="$(pwd)${PYTHONPATH:+:$PYTHONPATH}"
 
 # Start MCP Server 1: QnA + Summarizer
-.venv/bin/python -m mcp.server \
-  --tool server/qna.py \
-  --tool server/summarizer.py \
+.venv/bin/python server/summarizer_qna_server.py \
+  --transport streamable-http \
   --host 127.0.0.1 \
   --port 5001 \
+  --warm \
   > logs/mcp_server_qna_summarizer.log 2>&1 &
 echo "Started MCP Server 1 (QnA + Summarizer) on port 5001, logging to logs/mcp_server_qna_summarizer.log"
 
 # Start MCP Server 2: Extractor, Embedder, Chunker
-.venv/bin/python -m mcp.server \
-  --tool server/pdf_extractor.py \
-  --tool server/embedder.py \
-  --tool server/chunker.py \
+.venv/bin/python server/pdf_processing_server.py \
+  --transport streamable-http \
   --host 127.0.0.1 \
   --port 5002 \
+  --warm \
   > logs/mcp_server_extract_embed_chunk.log 2>&1 &
-echo "Started MCP Server 2 (Extractor, Embedder, Chunker) on port 5002, logging to logs/mcp_server_extract_embed_chunk.log" 
\ No newline at end of file
+echo "Started MCP Server 2 (Extractor, Embedder, Chunker) on port 5002, logging to logs/mcp_server_extract_embed_chunk.log"
+
+echo "export SUMMARIZER_QNA_SERVER_URL=http://127.0.0.1:5001/mcp"
+echo "export PDF_PROCESSING_SERVER_URL=http://127.0.0.1:5002/mcp"